@@ -13,21 +13,25 @@ from langchain_deepseek import ChatDeepSeek
 from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from transcript_writer import TranscriptWriter, turn_record
 
 
-logger.info("Set API keys as environment variables")
-with open("./api_keys.json", 'r') as f:
-    api_keys = json.loads(f.read())
+def load_api_keys(path:str="./api_keys.json"):
+    logger.info("Set API keys as environment variables")
+    with open(path, 'r') as f:
+        api_keys = json.loads(f.read())
 
-for key in api_keys.keys():
-    os.environ[key] = api_keys[key]
+    for key in api_keys.keys():
+        os.environ[key] = api_keys[key]
 
 class Model:
     model_name: str
-    model: ChatOpenAI|ChatDeepSeek|ChatAnthropic|ChatGoogleGenerativeAI
+    model: ChatOpenAI|ChatDeepSeek|ChatAnthropic|ChatGoogleGenerativeAI|FakeListChatModel
 
-    def __init__(self, short_name, model_name, provider):
+    def __init__(self, short_name, model_name, provider, responses:list=None):
        self.model_name = short_name
+       self.provider = provider
        self.temperature = 0.2
        self.verbose = False
        self.max_tokens = 4096
@@ -44,6 +48,10 @@ class Model:
            case "openai":
                self.model = ChatOpenAI(model=model_name, temperature=self.temperature, verbose=self.verbose, max_tokens=self.max_tokens)  
                print(f"OpenAI model initialized, max tokens {self.model.max_tokens}, temperature {self.model.temperature}")
+           case "fake":
+               # offline stand-in, answers with the given responses in turn
+               self.model = FakeListChatModel(responses=responses or [f"Response from {short_name}"])
+               print(f"Fake model initialized with {len(self.model.responses)} responses")
 
 def read_prompts(path_to_file:str):
     logger.info(f"Reading prompts from file {path_to_file}")
@@ -54,8 +62,7 @@ def read_prompts(path_to_file:str):
         prompt_list.append(task["text"])
     return prompt_list
 
-def run_conversation_and_save(llm:Model, prompts:list,language:str, try_number:int,):
-    
+def build_chain_with_memory(llm:Model, message_history:InMemoryChatMessageHistory):
     logger.info(f"Setting up LLMChain for conversatiom with model {llm.model_name}")
 
     chat_prompt = ChatPromptTemplate.from_messages([
@@ -64,48 +71,46 @@ def run_conversation_and_save(llm:Model, prompts:list,language:str, try_number:i
     ])
 
     chain = chat_prompt | llm.model #pipe style, replaces LLMChain()
-    
+
     logger.info("Setting up memory to keep context")
-    message_history = InMemoryChatMessageHistory()
-    chain_with_memory = RunnableWithMessageHistory(
+    return RunnableWithMessageHistory(
         chain,
         lambda session_id: message_history,
         input_messages_key="input",
         history_messages_key="history"
     )
+
+def response_markdown(result):
+    if result.content != '':
+        return f"**LLM Response:**\n\n{result.content.strip()}\n"
+    return f"**LLM Response - content not available, saving full reasoning:**\n\n{result}\n"
+
+def run_conversation_and_save(llm:Model, prompts:list,language:str, try_number:int,):
+
+    message_history = InMemoryChatMessageHistory()
+    chain_with_memory = build_chain_with_memory(llm, message_history)
     output_dir = f"./{language}/results_{llm.model_name}/solution_try_{try_number}"
     os.makedirs(output_dir)
     output_file_path = os.path.join(output_dir, f"conversation_{llm.model_name}_{language}_try_{try_number}.md")
+    records_file_path = os.path.join(output_dir, f"conversation_{llm.model_name}_{language}_try_{try_number}.jsonl")
     time_start = datetime.datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
-    markdown_output = [f"# Conversational Code Generation - {llm.model_name} with {language}, {time_start}\n"]
-    with open(output_file_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(markdown_output))
-
-    logger.info("Executing prompts and collecting responses")
-    for i, p in enumerate(prompts, start=1):
-        markdown_output = []
-        markdown_output.append(f"## Prompt {i}\n")
-        markdown_output.append(f"**User:** {p}\n")
-        with open(output_file_path, "a", encoding="utf-8") as f:
-            f.write("\n".join(markdown_output))
-
-        if llm.model_name=='claude-opus-4':
-            time.sleep(60)
-
-        result = chain_with_memory.invoke({"input": p},config={"configurable": {"session_id": str(uuid.uuid4())}})
-        markdown_output = []
-        if result.content != '':
-            markdown_output.append(f"**LLM Response:**\n\n{result.content.strip()}\n")
-        else:
-            markdown_output.append(f"**LLM Response - content not available, saving full reasoning:**\n\n{result}\n")
-        with open(output_file_path, "a", encoding="utf-8") as f:
-            f.write("\n".join(markdown_output))
-    logger.info("Prompt execution finished")
-
-    time_end = datetime.datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
-    markdown_output = [f"# The end - {llm.model_name} with {language}, {time_end}\n"]
-    with open(output_file_path, "a", encoding="utf-8") as f:
-        f.write("\n".join(markdown_output))
+
+    with TranscriptWriter(output_file_path, records_file_path) as transcript:
+        transcript.write(f"# Conversational Code Generation - {llm.model_name} with {language}, {time_start}\n")
+
+        logger.info("Executing prompts and collecting responses")
+        for i, p in enumerate(prompts, start=1):
+            if llm.model_name=='claude-opus-4':
+                time.sleep(60)
+
+            started = time.perf_counter()
+            result = chain_with_memory.invoke({"input": p},config={"configurable": {"session_id": str(uuid.uuid4())}})
+            latency = time.perf_counter() - started
+            transcript.write_turn(i, p, response_markdown(result), turn_record(llm.model_name, language, try_number, i, latency, result))
+        logger.info("Prompt execution finished")
+
+        time_end = datetime.datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
+        transcript.write(f"# The end - {llm.model_name} with {language}, {time_end}\n")
 
     return True
 
@@ -114,7 +119,9 @@ if __name__=="__main__":
     parser.add_argument('-l', '--language', help='Path to yaml file with prompts to execute.', required=True)
     parser.add_argument('-v', '--version', help='Version of the run.', required=True)
     args = parser.parse_args()
-        
+
+    load_api_keys()
+
     logger.info("Initialize models")
     gpt = Model(short_name="gpt-4.1",model_name="gpt-4.1", provider="openai") #https://platform.openai.com/docs/models/gpt-4.1
     deepseek = Model(short_name="deepseek-chat",model_name="deepseek-chat", provider="deepseek") #https://api-docs.deepseek.com/
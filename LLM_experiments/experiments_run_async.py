@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import uuid
+import time
+import asyncio
+import argparse
+import datetime
+from loguru import logger
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from experiments_run import Model, load_api_keys, read_prompts, build_chain_with_memory, response_markdown
+from transcript_writer import TranscriptWriter, turn_record
+
+# Runs the same conversations as experiments_run.py, but all models and tries
+# at once with ainvoke. Every provider gets a token bucket instead of a fixed
+# sleep before each prompt, and every answered prompt is saved to a checkpoint
+# file next to the transcript, so an interrupted run continues from the first
+# prompt without an answer. --fake swaps the models for offline stand-ins,
+# named fake-<model> so they never write into the folders of the real models.
+
+# requests per minute, None means no limit
+DEFAULT_RATE_LIMITS = {"anthropic": 1, "openai": 30, "deepseek": 30, "google": 5, "fake": None}
+
+
+class TokenBucket:
+    # Allows rate_per_minute requests per minute with bursts of up to capacity.
+    # Waiters are served in order, the lock is held while one of them sleeps.
+
+    def __init__(self, rate_per_minute:float, capacity:int=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated)*self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens)/self.rate)
+
+
+def make_limiters(rate_limits:dict):
+    return {provider: TokenBucket(rate) for provider, rate in rate_limits.items() if rate is not None}
+
+
+def load_checkpoint(path:str):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path:str, checkpoint:dict):
+    # written to a temporary file first, an interrupted write keeps the old one
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'w', encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary_path, path)
+
+
+async def invoke_with_retries(chain_with_memory, prompt:str, limiter:TokenBucket=None, max_retries:int=2):
+    # Returns (result, retries). Every attempt takes a token from the limiter,
+    # failed attempts wait 2, 4, 8... seconds before the next one.
+    retries = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            result = await chain_with_memory.ainvoke({"input": prompt}, config={"configurable": {"session_id": str(uuid.uuid4())}})
+            return result, retries
+        except Exception as e:
+            if retries >= max_retries:
+                raise
+            retries += 1
+            logger.warning(f"Request failed ({e}), retry {retries} of {max_retries}")
+            await asyncio.sleep(2**retries)
+
+
+async def run_conversation_async(llm:Model, prompts:list, language:str, try_number, limiter:TokenBucket=None, output_root:str=".", max_retries:int=2):
+    output_dir = os.path.join(output_root, language, f"results_{llm.model_name}", f"solution_try_{try_number}")
+    file_stem = os.path.join(output_dir, f"conversation_{llm.model_name}_{language}_try_{try_number}")
+    checkpoint_path = os.path.join(output_dir, f"checkpoint_{llm.model_name}_{language}_try_{try_number}.json")
+    # like experiments_run.py an existing folder is never reused, unless it has
+    # a checkpoint of this runner to continue from
+    if os.path.exists(output_dir) and not os.path.exists(checkpoint_path):
+        raise FileExistsError(f"{output_dir} already exists and has no checkpoint, refusing to overwrite it")
+    os.makedirs(output_dir, exist_ok=True)
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint is None:
+        time_start = datetime.datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
+        checkpoint = {"header": f"# Conversational Code Generation - {llm.model_name} with {language}, {time_start}\n", "turns": []}
+        save_checkpoint(checkpoint_path, checkpoint)
+    elif checkpoint["turns"]:
+        logger.info(f"Resuming {llm.model_name}, try {try_number} after prompt {len(checkpoint['turns'])}")
+
+    # the answered prompts go back into the memory, the transcript is rewritten
+    # from the checkpoint so a prompt without an answer is not left in it
+    message_history = InMemoryChatMessageHistory()
+    chain_with_memory = build_chain_with_memory(llm, message_history)
+    with TranscriptWriter(file_stem + ".md", file_stem + ".jsonl") as transcript:
+        transcript.write(checkpoint["header"])
+        for turn in checkpoint["turns"]:
+            message_history.add_user_message(turn["input"])
+            message_history.add_ai_message(turn["content"])
+            transcript.write_turn(turn["prompt"], turn["input"], turn["response"], turn["record"])
+
+        logger.info(f"Executing prompts for {llm.model_name}, try {try_number}")
+        for i, p in enumerate(prompts, start=1):
+            if i <= len(checkpoint["turns"]):
+                continue
+
+            started = time.perf_counter()
+            result, retries = await invoke_with_retries(chain_with_memory, p, limiter, max_retries)
+            record = turn_record(llm.model_name, language, try_number, i, time.perf_counter() - started, result, retries)
+            response = response_markdown(result)
+            checkpoint["turns"].append({"prompt": i, "input": p, "content": result.content, "response": response, "record": record})
+            save_checkpoint(checkpoint_path, checkpoint)
+            transcript.write_turn(i, p, response, record)
+        logger.info(f"Prompt execution finished for {llm.model_name}, try {try_number}")
+
+        time_end = datetime.datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
+        transcript.write(f"# The end - {llm.model_name} with {language}, {time_end}\n")
+
+    return True
+
+
+async def run_all(llms:list, prompts:list, language:str, tries:list, rate_limits:dict, output_root:str=".", max_retries:int=2):
+    # Returns one result per (model, try), True or the exception that stopped
+    # the conversation. A failing conversation does not cancel the others, it
+    # continues from its checkpoint on the next run.
+    limiters = make_limiters(rate_limits)
+    conversations = [(llm, try_number) for llm in llms for try_number in tries]
+    runs = [run_conversation_async(llm, prompts, language, try_number, limiters.get(llm.provider), output_root, max_retries)
+            for llm, try_number in conversations]
+    results = await asyncio.gather(*runs, return_exceptions=True)
+    for (llm, try_number), result in zip(conversations, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Conversation of {llm.model_name}, try {try_number} failed: {result!r}")
+    return results
+
+
+def parse_rate_limits(overrides:list):
+    rate_limits = dict(DEFAULT_RATE_LIMITS)
+    for override in overrides or []:
+        provider, rate = override.split("=")
+        rate_limits[provider] = None if rate == "none" else float(rate)
+    return rate_limits
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description='Runs the experiment conversations of all models and tries concurrently.')
+    parser.add_argument('-l', '--language', help='Language of the prompts, reads prompts_final_<language>.yaml.', required=True)
+    parser.add_argument('-v', '--version', nargs='+', help='Versions (tries) of the run, all of them run concurrently.', required=True)
+    parser.add_argument('-r', '--rate-limit', action='append', help='Requests per minute for a provider, e.g. anthropic=1 or openai=none. Can be repeated.')
+    parser.add_argument('-o', '--output-root', default=".", help='Folder where the <language>/results_<model> folders are created.')
+    parser.add_argument('--max-retries', type=int, default=2, help='Retries of a failed request before the conversation is stopped.')
+    parser.add_argument('--fake', action='store_true', help='Use offline fake models instead of the real providers.')
+    args = parser.parse_args()
+
+    prompts = read_prompts(f"./prompts_final_{args.language}.yaml")
+
+    logger.info("Initialize models")
+    if args.fake:
+        llms = [Model(short_name=name, model_name=name, provider="fake", responses=[f"Fake answer {i} from {name}" for i in range(1, len(prompts)+1)])
+                for name in ["fake-gpt-4.1", "fake-claude-opus-4", "fake-deepseek-chat"]]
+    else:
+        load_api_keys()
+        gpt = Model(short_name="gpt-4.1",model_name="gpt-4.1", provider="openai")
+        deepseek = Model(short_name="deepseek-chat",model_name="deepseek-chat", provider="deepseek")
+        claude = Model(short_name="claude-opus-4",model_name="claude-opus-4-20250514", provider="anthropic")
+        llms = [gpt, claude, deepseek]
+
+    results = asyncio.run(run_all(llms, prompts, args.language, args.version, parse_rate_limits(args.rate_limit), args.output_root, args.max_retries))
+    sys.exit(1 if any(isinstance(result, BaseException) for result in results) else 0)
@@ -4,7 +4,7 @@ from typing import Dict, Any, List
 
 from src.clustering import (
     build_tree_from_scores,
-    convert_tree_to_newick,
+    write_newick,
     get_clusters_by_threshold
 )
 from src.visualization import plot_dendrogram
@@ -71,6 +71,16 @@ def save_dict_to_json(data: Dict, file_path: Path):
     except IOError as e:
         print(f"Error: Could not write to file {file_path}. Reason: {e}")
 
+def save_newick_files(linkage_matrix, species_names: List[str], simple_path: Path, distance_path: Path):
+    """Saves the tree in Newick format, without and with distances, in a single traversal."""
+    print(f"Saving Newick trees to: {simple_path} and {distance_path}")
+    try:
+        with open(simple_path, 'w') as simple_out, open(distance_path, 'w') as distance_out:
+            write_newick(linkage_matrix, species_names, simple_out, distance_out)
+        print(f"Successfully saved {simple_path.name} and {distance_path.name}.")
+    except IOError as e:
+        print(f"Error: Could not write Newick files. Reason: {e}")
+
 def main():
     """
     Main pipeline to build a tree, visualize it, and extract clusters.
@@ -90,13 +100,9 @@ def main():
     print("Tree construction complete.")
 
     # --- Newick Export ---
-    newick_simple = convert_tree_to_newick(linkage_matrix, species_names, False)
     output_simple_path = OUTPUT_DIR / f"tree_{BLOSUM_VERSION}_newick.nw"
-    save_string_to_file(newick_simple, output_simple_path)
-
-    newick_with_distance = convert_tree_to_newick(linkage_matrix, species_names, True)
     output_distance_path = OUTPUT_DIR / f"tree_{BLOSUM_VERSION}_newick_with_distance.nw"
-    save_string_to_file(newick_with_distance, output_distance_path)
+    save_newick_files(linkage_matrix, species_names, output_simple_path, output_distance_path)
 
     # --- Dendrogram Visualization ---
     dendrogram_output_path = OUTPUT_DIR / f"phylogenetic_tree_{BLOSUM_VERSION}.png"
@@ -1,19 +1,47 @@
 # src/alignment.py
 
-from typing import Dict
+from typing import Dict, List
+import numpy as np
 
 class ScoringHandler:
-    """A handler to easily retrieve scores from a flattened BLOSUM dictionary."""
+    """
+    A handler that compiles a flattened BLOSUM dictionary into a dense scoring model.
+
+    Single-letter keys of the dictionary are gap scores, two-letter keys are
+    substitution scores. Symbols are mapped to integer indices once, so the
+    alignment never has to build or hash string keys. The last index is reserved
+    for symbols that are not present in the dictionary and scores 0.
+    """
     def __init__(self, blosum_data: Dict[str, int]):
         self._data = blosum_data
+        self.alphabet = "".join(key for key in blosum_data if len(key) == 1)
+        self.index = {symbol: i for i, symbol in enumerate(self.alphabet)}
+        self.unknown_index = len(self.alphabet)
+
+        size = len(self.alphabet) + 1
+        self.substitution_matrix = np.zeros((size, size), dtype=np.int16)
+        self.gap_costs = np.zeros(size, dtype=np.int16)
+        for i, char1 in enumerate(self.alphabet):
+            self.gap_costs[i] = blosum_data[char1]
+            for j, char2 in enumerate(self.alphabet):
+                key1 = char1 + char2
+                key2 = char2 + char1
+                self.substitution_matrix[i, j] = blosum_data.get(key1, blosum_data.get(key2, 0))
+
+    def encode(self, sequence: str) -> np.ndarray:
+        """Encodes a sequence as an array of alphabet indices."""
+        return np.array(
+            [self.index.get(char, self.unknown_index) for char in sequence],
+            dtype=np.uint8
+        )
 
     def get_substitution_score(self, char1: str, char2: str) -> int:
-        key1 = char1 + char2
-        key2 = char2 + char1
-        return self._data.get(key1, self._data.get(key2, 0))
+        i = self.index.get(char1, self.unknown_index)
+        j = self.index.get(char2, self.unknown_index)
+        return int(self.substitution_matrix[i, j])
 
     def get_gap_score(self, char: str) -> int:
-        return self._data.get(char, 0)
+        return int(self.gap_costs[self.index.get(char, self.unknown_index)])
 
 
 def calculate_nw_score(
@@ -22,22 +50,34 @@ def calculate_nw_score(
     scoring_handler: ScoringHandler
 ) -> int:
     """Calculates the Needleman-Wunsch alignment score for two sequences."""
-    n = len(seq1)
-    m = len(seq2)
+    codes1 = scoring_handler.encode(seq1)
+    codes2 = scoring_handler.encode(seq2)
+    n = len(codes1)
+    m = len(codes2)
+
+    gaps1: List[int] = scoring_handler.gap_costs[codes1].tolist()
+    gaps2: List[int] = scoring_handler.gap_costs[codes2].tolist()
+    # one row of scores against seq2 for every symbol of the alphabet
+    profile: List[List[int]] = scoring_handler.substitution_matrix[:, codes2].tolist()
+    row_symbols: List[int] = codes1.tolist()
+
     dp_matrix = [[0] * (m + 1) for _ in range(n + 1)]
 
     for i in range(1, n + 1):
-        dp_matrix[i][0] = dp_matrix[i - 1][0] + scoring_handler.get_gap_score(seq1[i - 1])
+        dp_matrix[i][0] = dp_matrix[i - 1][0] + gaps1[i - 1]
 
     for j in range(1, m + 1):
-        dp_matrix[0][j] = dp_matrix[0][j - 1] + scoring_handler.get_gap_score(seq2[j - 1])
+        dp_matrix[0][j] = dp_matrix[0][j - 1] + gaps2[j - 1]
 
     for i in range(1, n + 1):
+        previous_row = dp_matrix[i - 1]
+        current_row = dp_matrix[i]
+        substitution_row = profile[row_symbols[i - 1]]
+        deletion_cost = gaps1[i - 1]
         for j in range(1, m + 1):
-            char1, char2 = seq1[i - 1], seq2[j - 1]
-            match_mismatch = dp_matrix[i - 1][j - 1] + scoring_handler.get_substitution_score(char1, char2)
-            deletion = dp_matrix[i - 1][j] + scoring_handler.get_gap_score(char1)
-            insertion = dp_matrix[i][j - 1] + scoring_handler.get_gap_score(char2)
-            dp_matrix[i][j] = max(match_mismatch, deletion, insertion)
+            match_mismatch = previous_row[j - 1] + substitution_row[j - 1]
+            deletion = previous_row[j] + deletion_cost
+            insertion = current_row[j - 1] + gaps2[j - 1]
+            current_row[j] = max(match_mismatch, deletion, insertion)
 
-    return dp_matrix[n][m]
\ No newline at end of file
+    return dp_matrix[n][m]
@@ -1,6 +1,7 @@
 # src/clustering.py
 
-from typing import Dict, List, Tuple
+import io
+from typing import Dict, List, Optional, TextIO, Tuple
 import numpy as np
 from scipy.cluster.hierarchy import linkage, fcluster
 from scipy.spatial.distance import squareform
@@ -61,33 +62,77 @@ def get_clusters_by_threshold(
 
     return list(clusters.values())
 
-def _build_newick_recursive(
-    node_id: int,
+def write_newick(
     linkage_matrix: np.ndarray,
     species_names: List[str],
-    parent_height: float,
-    with_distance: bool
-) -> str:
-    """Recursively builds a Newick format string for a given node."""
-    num_species = len(species_names)
-    if node_id < num_species:
-        leaf_name = species_names[int(node_id)]
-        if with_distance:
-            branch_length = int(parent_height)
-            return f"{leaf_name}:{branch_length}"
-        return leaf_name
-
-    merge_row = linkage_matrix[int(node_id) - num_species]
-    child1_id, child2_id, current_height = merge_row[0], merge_row[1], merge_row[2]
+    simple_out: Optional[TextIO] = None,
+    distance_out: Optional[TextIO] = None,
+    chunk_size: int = 4096
+) -> None:
+    """
+    Writes the tree as Newick, without and/or with branch lengths, in one traversal.
 
-    child1_str = _build_newick_recursive(child1_id, linkage_matrix, species_names, current_height, with_distance)
-    child2_str = _build_newick_recursive(child2_id, linkage_matrix, species_names, current_height, with_distance)
+    An explicit stack replaces recursion, so deep single-linkage trees do not hit
+    the recursion limit, and the output is written to the file-like objects in
+    chunks instead of being assembled from nested strings.
+    """
+    num_species = len(species_names)
+    if linkage_matrix.shape[0] == 0:
+        for out in (simple_out, distance_out):
+            if out is not None:
+                out.write("();")
+        return
 
-    node_str = f"({child1_str},{child2_str})"
-    if with_distance:
-        branch_length = int(parent_height - current_height)
-        node_str += f":{branch_length}"
-    return node_str
+    children = linkage_matrix[:, :2].astype(int).tolist()
+    heights = linkage_matrix[:, 2].tolist()
+    root_id = num_species + (num_species - 1) - 1
+    root_height = heights[-1]
+
+    simple_parts: List[str] = []
+    distance_parts: List[str] = []
+    # items are (node_id, parent_height) or ready-made (simple, with_distance) pieces
+    stack: List[Tuple] = [(root_id, root_height)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item[0], str):
+            simple_parts.append(item[0])
+            distance_parts.append(item[1])
+        else:
+            node_id, parent_height = item
+            if node_id < num_species:
+                leaf_name = species_names[node_id]
+                simple_parts.append(leaf_name)
+                distance_parts.append(f"{leaf_name}:{int(parent_height)}")
+            else:
+                child1_id, child2_id = children[node_id - num_species]
+                current_height = heights[node_id - num_species]
+                simple_parts.append("(")
+                distance_parts.append("(")
+                stack.append((")", f"):{int(parent_height - current_height)}"))
+                stack.append((child2_id, current_height))
+                stack.append((",", ","))
+                stack.append((child1_id, current_height))
+
+        if len(simple_parts) >= chunk_size:
+            _flush_newick(simple_parts, simple_out, distance_parts, distance_out)
+
+    simple_parts.append(";")
+    distance_parts.append(";")
+    _flush_newick(simple_parts, simple_out, distance_parts, distance_out)
+
+def _flush_newick(
+    simple_parts: List[str],
+    simple_out: Optional[TextIO],
+    distance_parts: List[str],
+    distance_out: Optional[TextIO]
+) -> None:
+    """Writes the collected Newick pieces and empties the buffers."""
+    if simple_out is not None:
+        simple_out.write("".join(simple_parts))
+    if distance_out is not None:
+        distance_out.write("".join(distance_parts))
+    simple_parts.clear()
+    distance_parts.clear()
 
 def convert_tree_to_newick(
     linkage_matrix: np.ndarray,
@@ -95,11 +140,9 @@ def convert_tree_to_newick(
     with_distance: bool = False
 ) -> str:
     """Converts a linkage matrix from SciPy into a Newick format string."""
-    num_species = len(species_names)
-    if linkage_matrix.shape[0] == 0:
-        return "();"
-    
-    root_id = num_species + (num_species - 1) - 1
-    root_height = linkage_matrix[-1, 2]
-    newick_str = _build_newick_recursive(root_id, linkage_matrix, species_names, root_height, with_distance)
-    return f"{newick_str};"
\ No newline at end of file
+    out = io.StringIO()
+    if with_distance:
+        write_newick(linkage_matrix, species_names, distance_out=out)
+    else:
+        write_newick(linkage_matrix, species_names, simple_out=out)
+    return out.getvalue()
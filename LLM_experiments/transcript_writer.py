@@ -0,0 +1,73 @@
+import json
+
+# Transcript sink for the experiment runs. The markdown transcript and a JSONL
+# file with one record per prompt (latency, token counts, retries) are kept
+# open for the whole conversation, turns are buffered and written every
+# flush_every turns and when the writer is closed.
+
+
+def usage_tokens(result):
+    # token counts reported by the provider, None when it does not report them
+    usage = getattr(result, "usage_metadata", None) or {}
+    return usage.get("input_tokens"), usage.get("output_tokens")
+
+
+class TranscriptWriter:
+
+    def __init__(self, markdown_path:str, jsonl_path:str=None, flush_every:int=5):
+        self.flush_every = flush_every
+        self.markdown = open(markdown_path, "w", encoding="utf-8")
+        self.jsonl = open(jsonl_path, "w", encoding="utf-8") if jsonl_path else None
+        self.markdown_buffer = []
+        self.records_buffer = []
+        self.pending_turns = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, text:str):
+        self.markdown_buffer.append(text)
+
+    def write_turn(self, prompt_number:int, prompt:str, response:str, record:dict=None):
+        self.markdown_buffer.append(f"## Prompt {prompt_number}\n\n**User:** {prompt}\n")
+        self.markdown_buffer.append(response)
+        if record is not None:
+            self.records_buffer.append(json.dumps(record) + "\n")
+        self.pending_turns += 1
+        if self.pending_turns >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.markdown.write("".join(self.markdown_buffer))
+        self.markdown.flush()
+        self.markdown_buffer.clear()
+        if self.jsonl is not None:
+            self.jsonl.write("".join(self.records_buffer))
+            self.jsonl.flush()
+        self.records_buffer.clear()
+        self.pending_turns = 0
+
+    def close(self):
+        if self.markdown.closed:
+            return
+        self.flush()
+        self.markdown.close()
+        if self.jsonl is not None:
+            self.jsonl.close()
+
+
+def turn_record(model_name:str, language:str, try_number, prompt_number:int, latency:float, result, retries:int=0):
+    input_tokens, output_tokens = usage_tokens(result)
+    return {
+        "model": model_name,
+        "language": language,
+        "try": try_number,
+        "prompt": prompt_number,
+        "latency_s": round(latency, 3),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "retries": retries,
+    }
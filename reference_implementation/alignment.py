@@ -0,0 +1,219 @@
+import gzip
+import json
+import argparse
+import itertools
+import numpy as np
+from scoring_model import ScoringModel, load_scoring_model
+from needleman_wunsch import needleman_wunsch_last_row
+
+blosum_json_file_path = "../starter_code/blosum62.json"
+organisms_json_file_path = "../starter_code/organisms.json"
+clusters_json_file_path = "./clusters_for_blosum62.json"
+alignments_output_path = "./alignments_blosum62.tsv.gz"
+
+# Full Needleman-Wunsch alignments in linear space (Hirschberg). The middle
+# row of seq1 is scored forward from the top and backward from the bottom
+# with needleman_wunsch_last_row, the column where the two halves add up to
+# the best score splits the problem into two independent halves. Blocks of at
+# most BLOCK_CELLS cells are aligned with a full matrix and a traceback, so
+# memory stays linear in the length of the sequences.
+#
+# An alignment is an edit script with one character per column:
+#   "=" same residue in both sequences   "X" substitution
+#   "D" residue of seq1 against a gap    "I" residue of seq2 against a gap
+# cigar() compresses it into runs, e.g. 12=1X3=2D40=.
+
+BLOCK_CELLS = 4096
+
+
+def _align_block(codes1, codes2, model:ScoringModel):
+    # Full matrix alignment of a small block, ties prefer the diagonal, then a
+    # gap in seq2 (D), then a gap in seq1 (I).
+    n = len(codes1)
+    m = len(codes2)
+    gap1 = model.gap_costs[codes1].tolist()
+    gap2 = model.gap_costs[codes2].tolist()
+    substitution = model.substitution
+    symbols1 = codes1.tolist()
+    symbols2 = codes2.tolist()
+
+    M = [[0]*(m+1) for _ in range(n+1)]
+    for i in range(1, n+1):
+        M[i][0] = M[i-1][0] + gap1[i-1]
+    for j in range(1, m+1):
+        M[0][j] = M[0][j-1] + gap2[j-1]
+    for i in range(1, n+1):
+        previous_row = M[i-1]
+        current_row = M[i]
+        scores = substitution[symbols1[i-1]].tolist()
+        for j in range(1, m+1):
+            current_row[j] = max(previous_row[j-1] + scores[symbols2[j-1]],
+                                 previous_row[j] + gap1[i-1],
+                                 current_row[j-1] + gap2[j-1])
+
+    ops = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and M[i][j] == M[i-1][j-1] + substitution[symbols1[i-1]][symbols2[j-1]]:
+            ops.append("=" if symbols1[i-1] == symbols2[j-1] else "X")
+            i -= 1
+            j -= 1
+        elif i > 0 and M[i][j] == M[i-1][j] + gap1[i-1]:
+            ops.append("D")
+            i -= 1
+        else:
+            ops.append("I")
+            j -= 1
+    return ops[::-1]
+
+
+def hirschberg(codes1, codes2, model:ScoringModel):
+    # Returns the edit script of an optimal alignment of two encoded sequences.
+    # The halves are kept on an explicit stack, left half on top, so the script
+    # is produced from left to right.
+    codes1 = np.asarray(codes1, dtype=np.intp)
+    codes2 = np.asarray(codes2, dtype=np.intp)
+    ops = []
+    stack = [(0, len(codes1), 0, len(codes2))]
+    while stack:
+        i0, i1, j0, j1 = stack.pop()
+        if i0 == i1:
+            ops.extend("I"*(j1 - j0))
+            continue
+        if j0 == j1:
+            ops.extend("D"*(i1 - i0))
+            continue
+        if i1 - i0 == 1 or (i1 - i0)*(j1 - j0) <= BLOCK_CELLS:
+            ops.extend(_align_block(codes1[i0:i1], codes2[j0:j1], model))
+            continue
+
+        middle = (i0 + i1)//2
+        forward = needleman_wunsch_last_row(codes1[i0:middle], codes2[j0:j1], model).astype(np.int64)
+        backward = needleman_wunsch_last_row(codes1[middle:i1][::-1], codes2[j0:j1][::-1], model)[::-1].astype(np.int64)
+        split = j0 + int(np.argmax(forward + backward))
+        stack.append((middle, i1, split, j1))
+        stack.append((i0, middle, j0, split))
+    return "".join(ops)
+
+
+def script_score(ops:str, codes1, codes2, model:ScoringModel):
+    score = 0
+    i = j = 0
+    for op in ops:
+        if op in "=X":
+            score += int(model.substitution[codes1[i], codes2[j]])
+            i += 1
+            j += 1
+        elif op == "D":
+            score += int(model.gap_costs[codes1[i]])
+            i += 1
+        else:
+            score += int(model.gap_costs[codes2[j]])
+            j += 1
+    return score
+
+
+def cigar(ops:str):
+    return "".join(f"{len(list(run))}{op}" for op, run in itertools.groupby(ops))
+
+
+def parse_cigar(cigar_string:str):
+    ops = []
+    count = 0
+    for char in cigar_string:
+        if char.isdigit():
+            count = count*10 + int(char)
+        else:
+            ops.append(char*count)
+            count = 0
+    return "".join(ops)
+
+
+def aligned_strings(seq1:str, seq2:str, ops:str):
+    aligned1 = []
+    aligned2 = []
+    i = j = 0
+    for op in ops:
+        if op == "I":
+            aligned1.append("-")
+        else:
+            aligned1.append(seq1[i])
+            i += 1
+        if op == "D":
+            aligned2.append("-")
+        else:
+            aligned2.append(seq2[j])
+            j += 1
+    return "".join(aligned1), "".join(aligned2)
+
+
+def align(seq1:str, seq2:str, model:ScoringModel):
+    # Returns (score, aligned seq1, aligned seq2, cigar)
+    codes1 = model.encode(seq1)
+    codes2 = model.encode(seq2)
+    ops = hirschberg(codes1, codes2, model)
+    aligned1, aligned2 = aligned_strings(seq1, seq2, ops)
+    return script_score(ops, codes1, codes2, model), aligned1, aligned2, cigar(ops)
+
+
+def _open_text(path:str, mode:str):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+
+def export_alignments(organisms:dict, pairs, model:ScoringModel, path:str):
+    # One line per pair: name1, name2, score and cigar separated by tabs. The
+    # aligned strings can be rebuilt from the sequences and the cigar, so the
+    # file stays small, a .gz path is compressed as well.
+    encoded = {}
+    count = 0
+    with _open_text(path, "w") as f:
+        for name1, name2 in pairs:
+            for name in (name1, name2):
+                if name not in encoded:
+                    encoded[name] = model.encode(organisms[name])
+            ops = hirschberg(encoded[name1], encoded[name2], model)
+            f.write(f"{name1}\t{name2}\t{script_score(ops, encoded[name1], encoded[name2], model)}\t{cigar(ops)}\n")
+            count += 1
+    return count
+
+
+def read_alignments(path:str):
+    # yields (name1, name2, score, cigar) for every line written by export_alignments
+    with _open_text(path, "r") as f:
+        for line in f:
+            name1, name2, score, cigar_string = line.rstrip("\n").split("\t")
+            yield name1, name2, int(score), cigar_string
+
+
+def cluster_pairs(clusters:list):
+    # all pairs of organisms that share a cluster
+    for cluster in clusters:
+        yield from itertools.combinations(cluster, 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Exports full Needleman-Wunsch alignments of selected pairs of organisms.')
+    parser.add_argument('-p', '--pair', nargs=2, action='append', metavar=('NAME1', 'NAME2'), help='Pair of organisms to align, can be repeated.')
+    parser.add_argument('-t', '--threshold', help='Align all pairs inside the clusters of this threshold, read from the clusters file.')
+    parser.add_argument('--clusters', default=clusters_json_file_path, help='JSON file with clusters for --threshold.')
+    parser.add_argument('-o', '--output', default=alignments_output_path, help='Output file, compressed when it ends with .gz.')
+    parser.add_argument('--show', action='store_true', help='Also print the aligned strings of every pair.')
+    args = parser.parse_args()
+
+    scoring_model = load_scoring_model(blosum_json_file_path)
+    with open(organisms_json_file_path, 'r') as j:
+        organisms = json.loads(j.read())
+
+    pairs = [tuple(pair) for pair in args.pair or []]
+    if args.threshold is not None:
+        with open(args.clusters, 'r') as j:
+            pairs += list(cluster_pairs(json.loads(j.read())[str(args.threshold)]))
+    if not pairs:
+        parser.error("no pairs selected, use --pair or --threshold")
+
+    count = export_alignments(organisms, pairs, scoring_model, args.output)
+    print(f"{count} alignments written to {args.output}")
+    if args.show:
+        for name1, name2, score, cigar_string in read_alignments(args.output):
+            aligned1, aligned2 = aligned_strings(organisms[name1], organisms[name2], parse_cigar(cigar_string))
+            print(f"{name1} / {name2}: {score}\n{aligned1}\n{aligned2}\n")
@@ -0,0 +1,207 @@
+import io
+import numpy as np
+from tree_utils import NEWICK_CHUNK_SIZE, find, write_newick
+
+NO_NODE = -1
+
+
+class ArrayTree:
+    # Struct-of-arrays form of the tree built by create_tree. Node k is described
+    # by left[k], right[k], parent[k], value[k] and distance[k], leaves are the
+    # nodes 0..n-1 and names holds their names. Internal nodes follow in the
+    # order they were merged, so the root is the last node. Unlike Node.parent,
+    # which create_tree points at the final root, parent holds the real parent.
+
+    def __init__(self, names:list):
+        n = len(names)
+        size = max(2*n - 1, 0)
+        self.names = list(names)
+        self.leaf_count = n
+        self.left = np.full(size, NO_NODE, dtype=np.int32)
+        self.right = np.full(size, NO_NODE, dtype=np.int32)
+        self.parent = np.full(size, NO_NODE, dtype=np.int32)
+        self.value = np.zeros(size, dtype=np.int64)
+        self.distance = np.zeros(size, dtype=np.int64)
+        self.root = size - 1
+
+    @classmethod
+    def from_edges(cls, names:list, edges:list):
+        # edges are (i, j, score) sorted by decreasing score, as returned by
+        # single_linkage_edges, node i of an edge becomes the left child
+        tree = cls(names)
+        n = tree.leaf_count
+        max_distance = edges[0][2] if edges else 0
+        tree.value[:n] = max_distance
+        cluster_node = np.arange(n, dtype=np.int32)
+        union_find = list(range(n))
+
+        for k, (i, j, v) in enumerate(edges):
+            node = n + k
+            root1, root2 = find(union_find, i), find(union_find, j)
+            left, right = cluster_node[root1], cluster_node[root2]
+            tree.left[node] = left
+            tree.right[node] = right
+            tree.parent[left] = node
+            tree.parent[right] = node
+            tree.value[node] = v
+            union_find[root1] = root2
+            cluster_node[root2] = node
+
+        tree.distance = tree.value - np.where(tree.parent == NO_NODE, tree.value, tree.value[tree.parent])
+        return tree
+
+    @classmethod
+    def from_node(cls, root):
+        # converts a tree of Node objects, leaves keep their left to right order
+        leaves = []
+        internal = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.left is None and node.right is None:
+                leaves.append(node)
+            else:
+                internal.append(node)
+                for child in (node.right, node.left):
+                    if child is not None:
+                        stack.append(child)
+
+        tree = cls([leaf.name for leaf in leaves])
+        # internal nodes are stored children first, so the root ends up last
+        ordered = leaves + internal[::-1]
+        index = {id(node): k for k, node in enumerate(ordered)}
+        for k, node in enumerate(ordered):
+            tree.value[k] = node.value
+            tree.distance[k] = getattr(node, "distance", 0)
+            for child, links in ((node.left, tree.left), (node.right, tree.right)):
+                if child is not None:
+                    links[k] = index[id(child)]
+                    tree.parent[index[id(child)]] = k
+        return tree
+
+    def is_leaf(self, k):
+        return k < self.leaf_count
+
+    def node(self, k=None):
+        return ArrayNode(self, self.root if k is None else k)
+
+    def make_newick(self, distance=False):
+        out = io.StringIO()
+        if distance:
+            self.write_newick(None, out)
+        else:
+            self.write_newick(out)
+        return out.getvalue()
+
+    def write_newick(self, out=None, out_with_distance=None, chunk_size=NEWICK_CHUNK_SIZE):
+        # same output as Tree.write_newick, with node indices instead of Nodes
+        children = [(None if l == NO_NODE else l, None if r == NO_NODE else r) for l, r in zip(self.left.tolist(), self.right.tolist())]
+        names = self.names + [''] * (len(children) - self.leaf_count)
+        distances = self.distance.tolist()
+        write_newick(self.root, children.__getitem__, names.__getitem__, distances.__getitem__, out, out_with_distance, chunk_size)
+
+    def clusters(self, thresholds:list):
+        # Same clusters, in the same order, as ClusterEngine(self.node()) but
+        # computed on the arrays. Leaves are laid out left subtree first and
+        # node k covers leaf_order[start[k]:end[k]]. Node k is a cluster for
+        # the thresholds in (highest value of its ancestors, value[k]], the
+        # clusters of one threshold are disjoint so preorder is order of start.
+        leaf_order, starts, ends, lows = self._layout()
+        highs = self.value
+        clusters_by_threshold = {}
+        for threshold in sorted(set(thresholds)):
+            nodes = np.nonzero((lows < threshold) & (highs >= threshold))[0]
+            nodes = nodes[np.argsort(starts[nodes], kind="stable")]
+            clusters_by_threshold[threshold] = [leaf_order[start:end] for start, end in zip(starts[nodes].tolist(), ends[nodes].tolist())]
+        return clusters_by_threshold
+
+    def _layout(self):
+        # Children always come before their parent (from_edges and from_node),
+        # so sizes are summed in index order and positions handed down in
+        # reverse order.
+        left = self.left.tolist()
+        right = self.right.tolist()
+        values = self.value.tolist()
+        size = len(left)
+        leaf_counts = [1]*self.leaf_count + [0]*(size - self.leaf_count)
+        for k in range(self.leaf_count, size):
+            leaf_counts[k] = (leaf_counts[left[k]] if left[k] != NO_NODE else 0) + (leaf_counts[right[k]] if right[k] != NO_NODE else 0)
+
+        starts = [0]*size
+        lows = [0]*size
+        if size:
+            lows[self.root] = np.iinfo(np.int64).min
+        for k in range(size - 1, self.leaf_count - 1, -1):
+            low = max(lows[k], values[k])
+            start = starts[k]
+            for child in (left[k], right[k]):
+                if child != NO_NODE:
+                    starts[child] = start
+                    lows[child] = low
+                    start += leaf_counts[child]
+
+        leaf_order = np.empty(self.leaf_count, dtype=object)
+        leaf_order[starts[:self.leaf_count]] = self.names
+        starts = np.array(starts, dtype=np.int64)
+        return leaf_order, starts, starts + np.array(leaf_counts, dtype=np.int64), np.array(lows, dtype=np.int64)
+
+    def generate_clusters(self, threshold):
+        # same clusters, in the same order, as generate_clusters on the Node tree
+        return [cluster.tolist() for cluster in self.clusters([threshold])[threshold]]
+
+
+class ArrayNode:
+    # Node compatible view of one node of an ArrayTree
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree:ArrayTree, index):
+        self.tree = tree
+        self.index = index
+
+    def _view(self, k):
+        return None if k == NO_NODE else ArrayNode(self.tree, int(k))
+
+    @property
+    def name(self):
+        return self.tree.names[self.index] if self.is_leaf else ''
+
+    @property
+    def value(self):
+        return int(self.tree.value[self.index])
+
+    @property
+    def distance(self):
+        return int(self.tree.distance[self.index])
+
+    @property
+    def left(self):
+        return self._view(self.tree.left[self.index])
+
+    @property
+    def right(self):
+        return self._view(self.tree.right[self.index])
+
+    @property
+    def parent(self):
+        return self._view(self.tree.parent[self.index])
+
+    @property
+    def root(self):
+        return None
+
+    @property
+    def is_leaf(self):
+        return self.tree.is_leaf(self.index)
+
+    def update_distance(self, distance):
+        self.tree.distance[self.index] = distance
+
+    def set_parent(self, parent):
+        self.tree.parent[self.index] = NO_NODE if parent is None else parent.index
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayNode) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
@@ -0,0 +1,231 @@
+import io
+import gc
+import sys
+import json
+import time
+import argparse
+import itertools
+import tracemalloc
+import importlib.util
+import numpy as np
+from scoring_model import load_scoring_model
+from needleman_wunsch import score_pairs, score_all_pairs_batched
+from score_matrix import PairwiseScores
+from array_tree import ArrayTree
+from phylogenetic_tree import Tree, UnionFind, init_tracking_cache, create_tree, create_tree_prim, single_linkage_edges, ClusterEngine
+
+# Benchmarks of the alignment -> tree -> clusters pipeline on synthetic data.
+#
+# Sequences are drawn from the amino acids of the BLOSUM matrix. Every stage is
+# run --repeat times and the fastest run is kept. tracemalloc slows down every
+# allocation, so the timed runs go without it and peak memory comes from one
+# more run of the stage with tracemalloc on. Aligning all pairs of thousands of
+# species takes hours, so the alignment stage aligns a sample of pairs for every
+# sequence length and reports the time per pair. The tree and cluster stages get a synthetic score
+# matrix of the full size. Kruskal and the Gemini solution both start from a
+# dict with every pair, they are skipped above --dict-limit species.
+#
+# Results can be saved as a JSON baseline, a later run compared against it
+# exits with 1 when a stage got slower or used more memory than allowed.
+
+blosum_json_file_path = "../starter_code/blosum62.json"
+gemini_clustering_path = "../LLM_experiments/results_gemini-2.5-pro/solution_python_try_1/src/clustering.py"
+baseline_file_path = "./benchmark_baseline.json"
+THRESHOLD_COUNT = 10
+# differences below these never count as a regression, stages of a few
+# milliseconds or with almost no allocations are mostly timer and allocator noise
+MIN_TIME_DIFFERENCE = 0.01
+MIN_MEMORY_DIFFERENCE = 1.0
+
+
+def synthetic_organisms(count:int, length:int, alphabet:str, seed=0, mutation_rate=0.3):
+    # every sequence is a mutated copy of one ancestor, with lengths varying by
+    # up to 10%, so alignments look like the ones of related species
+    rng = np.random.default_rng(seed)
+    symbols = np.frombuffer(alphabet.encode("ascii"), dtype=np.uint8)
+    ancestor = rng.choice(symbols, size=length)
+    organisms = {}
+    for k in range(count):
+        sequence = ancestor.copy()
+        mutated = rng.random(length) < mutation_rate
+        sequence[mutated] = rng.choice(symbols, size=int(mutated.sum()))
+        new_length = max(1, length + int(rng.integers(-length//10, length//10 + 1)))
+        sequence = np.resize(sequence, new_length) if new_length > length else sequence[:new_length]
+        organisms[f"Species {k:05d}"] = sequence.tobytes().decode("ascii")
+    return organisms
+
+
+def synthetic_scores(species:list, seed=0, low=500, high=2000):
+    # random scores in the range of the real ones, with plenty of ties
+    rng = np.random.default_rng(seed)
+    n = len(species)
+    return PairwiseScores(species, rng.integers(low, high, size=n*(n-1)//2, dtype=np.int32))
+
+
+def measure(function, repeat=1):
+    # Returns (result, seconds of the fastest of repeat runs, peak MB of a
+    # separate run under tracemalloc).
+    best_seconds = None
+    result = None
+    for _ in range(repeat):
+        # the result of the last run is freed before the next one
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best_seconds, peak / 2**20
+
+
+def load_gemini_clustering():
+    spec = importlib.util.spec_from_file_location("gemini_clustering", gemini_clustering_path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except ImportError as e:
+        print(f"Gemini solution skipped: {e}")
+        return None
+    return module
+
+
+def benchmark_alignment(scoring_model, lengths:list, pairs:int, repeat:int, seed=0):
+    results = {}
+    for length in lengths:
+        # enough species to get the requested number of distinct pairs
+        count = int(np.ceil((1 + np.sqrt(1 + 8*pairs))/2))
+        organisms = synthetic_organisms(count, length, scoring_model.alphabet, seed)
+        sample = list(itertools.islice(itertools.combinations(organisms, 2), pairs))
+        _, seconds, peak = measure(lambda: score_pairs(organisms, sample, scoring_model), repeat)
+        results[f"alignment/length={length}"] = {"seconds": seconds, "peak_mb": peak, "pairs": len(sample), "seconds_per_pair": seconds/len(sample)}
+        batched, seconds, peak = measure(lambda: score_all_pairs_batched(organisms, scoring_model), repeat)
+        results[f"alignment_batched/length={length}"] = {"seconds": seconds, "peak_mb": peak, "pairs": len(batched), "seconds_per_pair": seconds/len(batched)}
+    return results
+
+
+def benchmark_size(size:int, repeat:int, dict_limit:int, gemini=None, seed=0):
+    results = {}
+    species = [f"Species {k:05d}" for k in range(size)]
+    pairwise = synthetic_scores(species, seed)
+    thresholds = np.linspace(pairwise.condensed.min(), pairwise.condensed.max(), THRESHOLD_COUNT).astype(int).tolist()
+
+    def record(stage, function):
+        result, seconds, peak = measure(function, repeat)
+        results[f"{stage}/species={size}"] = {"seconds": seconds, "peak_mb": peak}
+        return result
+
+    (_, root) = record("create_tree_prim", lambda: create_tree_prim(Tree(), pairwise))
+
+    def write_newick():
+        out, out_with_distance = io.StringIO(), io.StringIO()
+        Tree().write_newick(root, out, out_with_distance)
+        return out_with_distance.getvalue()
+    record("write_newick", write_newick)
+    record("cluster_engine", lambda: ClusterEngine(root).clusters(thresholds))
+
+    array_tree = record("array_tree", lambda: ArrayTree.from_edges(species, single_linkage_edges(pairwise)))
+
+    def array_write_newick():
+        out, out_with_distance = io.StringIO(), io.StringIO()
+        array_tree.write_newick(out, out_with_distance)
+        return out_with_distance.getvalue()
+    record("array_write_newick", array_write_newick)
+    record("array_clusters", lambda: array_tree.clusters(thresholds))
+
+    if size > dict_limit:
+        return results
+
+    nw_scores = pairwise.to_dict()
+
+    def kruskal():
+        nw_scores_sorted = {k: v for k, v in sorted(nw_scores.items(), key=lambda item: item[1], reverse=True)}
+        tree = Tree()
+        tracking_cache = init_tracking_cache(dict.fromkeys(species), tree, nw_scores_sorted)
+        return create_tree(tree, nw_scores_sorted, tracking_cache, UnionFind(species))
+    record("create_tree_kruskal", kruskal)
+
+    if gemini is not None:
+        linkage_matrix, max_score = record("gemini_build_tree", lambda: gemini.build_tree_from_scores(nw_scores, species))
+
+        def gemini_write_newick():
+            out, out_with_distance = io.StringIO(), io.StringIO()
+            gemini.write_newick(linkage_matrix, species, out, out_with_distance)
+            return out_with_distance.getvalue()
+        record("gemini_write_newick", gemini_write_newick)
+        record("gemini_clusters", lambda: [gemini.get_clusters_by_threshold(linkage_matrix, species, t, max_score) for t in thresholds])
+    return results
+
+
+def compare_with_baseline(results:dict, baseline:dict, time_tolerance:float, memory_tolerance:float,
+                          min_time_difference:float=MIN_TIME_DIFFERENCE, min_memory_difference:float=MIN_MEMORY_DIFFERENCE):
+    # Returns the stages that got slower or bigger than the baseline allows. A
+    # stage has to exceed both the relative tolerance and the absolute minimal
+    # difference, so sub-millisecond stages and a baseline of 0 MB do not flag
+    # every bit of noise.
+    regressions = []
+    for stage, measured in results.items():
+        expected = baseline.get(stage)
+        if expected is None:
+            continue
+        if measured["seconds"] > max(expected["seconds"]*(1 + time_tolerance), expected["seconds"] + min_time_difference):
+            regressions.append(f"{stage}: {measured['seconds']:.3f}s, baseline {expected['seconds']:.3f}s")
+        if measured["peak_mb"] > max(expected["peak_mb"]*(1 + memory_tolerance), expected["peak_mb"] + min_memory_difference):
+            regressions.append(f"{stage}: {measured['peak_mb']:.1f}MB, baseline {expected['peak_mb']:.1f}MB")
+    return regressions
+
+
+def print_results(results:dict):
+    width = max(len(stage) for stage in results)
+    for stage, measured in results.items():
+        extra = f"  {measured['seconds_per_pair']*1000:.2f} ms/pair" if "seconds_per_pair" in measured else ""
+        print(f"{stage.ljust(width)}  {measured['seconds']:9.3f} s  {measured['peak_mb']:9.1f} MB{extra}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks alignment, tree building, Newick output and clustering on synthetic data.')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[100, 1000, 5000], help='Numbers of species for the tree and cluster stages.')
+    parser.add_argument('-l', '--lengths', type=int, nargs='+', default=[100, 400], help='Sequence lengths for the alignment stage.')
+    parser.add_argument('-p', '--pairs', type=int, default=50, help='Number of pairs aligned for every sequence length.')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs of every stage, the fastest one is kept.')
+    parser.add_argument('--dict-limit', type=int, default=1000, help='Largest size run through Kruskal and the Gemini solution, both need a dict of all pairs.')
+    parser.add_argument('--no-gemini', action='store_true', help='Do not benchmark the Gemini scipy solution.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data.')
+    parser.add_argument('-b', '--baseline', default=baseline_file_path, help='JSON baseline to compare with or to save.')
+    parser.add_argument('--save-baseline', action='store_true', help='Save the results as the new baseline instead of comparing.')
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help='Allowed relative slowdown before a stage counts as a regression.')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help='Allowed relative growth of peak memory before a stage counts as a regression.')
+    parser.add_argument('--min-time-difference', type=float, default=MIN_TIME_DIFFERENCE*1000, help='Slowdown in milliseconds that is never a regression, whatever the relative tolerance.')
+    parser.add_argument('--min-memory-difference', type=float, default=MIN_MEMORY_DIFFERENCE, help='Growth of peak memory in MB that is never a regression, whatever the relative tolerance.')
+    args = parser.parse_args()
+
+    scoring_model = load_scoring_model(blosum_json_file_path)
+    gemini = None if args.no_gemini else load_gemini_clustering()
+
+    results = benchmark_alignment(scoring_model, args.lengths, args.pairs, args.repeat, args.seed)
+    for size in args.sizes:
+        results.update(benchmark_size(size, args.repeat, args.dict_limit, gemini, args.seed))
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as j:
+            json.dump(results, j, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    else:
+        try:
+            with open(args.baseline, 'r') as j:
+                baseline = json.loads(j.read())
+        except FileNotFoundError:
+            print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+            sys.exit(0)
+        regressions = compare_with_baseline(results, baseline, args.time_tolerance, args.memory_tolerance,
+                                            args.min_time_difference/1000, args.min_memory_difference)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,82 @@
+import itertools
+from score_cache import sequence_digest
+
+# Organisms with identical sequences only need to be aligned once. Groups are
+# found by the digest of the sequence, the first name of a group (in the order
+# of the organisms) is its representative and the only one aligned. The
+# scores of the representatives are expanded back to every name, a name and
+# its duplicate score the same as the sequence aligned with itself.
+# Near duplicates are not collapsed, their scores differ and would not be
+# exact any more.
+
+
+def group_duplicates(organisms:dict, keep_duplicates=False):
+    # Returns (representatives, groups): the organisms dict restricted to one
+    # name per sequence, and representative -> all names with its sequence.
+    # keep_duplicates makes every name its own group.
+    if keep_duplicates:
+        return organisms, {name: [name] for name in organisms}
+    groups = {}
+    representative_of_digest = {}
+    for name, seq in organisms.items():
+        representative = representative_of_digest.setdefault(sequence_digest(seq), name)
+        groups.setdefault(representative, []).append(name)
+    representatives = {name: organisms[name] for name in groups}
+    return representatives, groups
+
+
+def duplicate_count(groups:dict):
+    return sum(len(names) - 1 for names in groups.values())
+
+
+def self_score_pairs(groups:dict):
+    # pairs to align for the scores between duplicates, one per group
+    return [(representative, representative) for representative, names in groups.items() if len(names) > 1]
+
+
+def expand_scores(all_animals:list, groups:dict, representative_scores:dict, self_scores:dict):
+    # Scores of all pairs of all_animals in combinations order, the format of
+    # organisms_scores_*.json. Pairs missing from representative_scores (e.g.
+    # below a cutoff) stay missing.
+    representative_of = {name: representative for representative, names in groups.items() for name in names}
+    all_scores = {}
+    for name1, name2 in itertools.combinations(all_animals, 2):
+        representative1 = representative_of[name1]
+        representative2 = representative_of[name2]
+        if representative1 == representative2:
+            score = self_scores.get(representative1+"_"+representative1)
+        else:
+            score = representative_scores.get(representative1+"_"+representative2, representative_scores.get(representative2+"_"+representative1))
+        if score is not None:
+            all_scores[name1+"_"+name2] = score
+    return all_scores
+
+
+def representative_scores_of(scores:dict, groups:dict):
+    # the pairs of a full score dict that are between two representatives
+    return {key: value for key, value in scores.items() if all(name in groups for name in key.split("_"))}
+
+
+def leaf_value(representative_scores:dict, scores:dict):
+    # Value of the leaves of a tree over the representatives: their highest
+    # score. When every organism has the same sequence there is no such score
+    # and the score of the duplicates (the sequence with itself) is used.
+    if representative_scores:
+        return max(representative_scores.values())
+    return max(scores.values())
+
+
+def expand_edges(species:list, groups:dict, edges:list, top):
+    # Spanning tree edges of the representatives, (i, j, score) indexing
+    # list(groups), as edges over all species. Every duplicate is joined to its
+    # representative first at top, the value of the leaves (see leaf_value),
+    # so duplicates hang off their node at zero distance.
+    index = {name: i for i, name in enumerate(species)}
+    representatives = list(groups)
+    joins = [(index[representative], index[name], top) for representative, names in groups.items() for name in names[1:]]
+    return joins + [(index[representatives[i]], index[representatives[j]], v) for i, j, v in edges]
+
+
+def duplicate_scores(groups:dict, value):
+    # the joins of expand_edges as score dict entries, for create_tree
+    return {representative+"_"+name: value for representative, names in groups.items() for name in names[1:]}
@@ -0,0 +1,128 @@
+import argparse
+import itertools
+import json
+import os
+from needleman_wunsch import score_pairs
+from scoring_model import load_scoring_model
+from duplicates import group_duplicates, representative_scores_of, leaf_value, expand_scores, expand_edges
+from phylogenetic_tree import Tree, ClusterEngine, edges_from_scores, sparse_single_linkage_edges, tree_from_edges, read_spanning_edges, write_spanning_edges
+from phylogenetic_tree import BLOSUM_VERSION, nw_json_file_path, organisms_json_file_path, newick_txt_file, newick_distance_txt_file, thresholds_file_path, clusters_output_path, spanning_edges_output_path
+
+blosum_json_file_path = f"../starter_code/blosum{BLOSUM_VERSION}.json"
+
+# Adds new organisms to already computed scores, tree and clusters.
+# Only the new-vs-existing and new-vs-new pairs are aligned. Single linkage
+# is the maximum spanning tree of the scores, so the spanning tree written by
+# phylogenetic_tree.py plus the new pairs hold every edge the updated tree
+# needs, and the tree is rebuilt from those O(n) edges instead of sorting all
+# O(n^2) pairs. Pairs are oriented and tie-broken by their position in
+# organisms.json like in a full rebuild; adding organisms keeps the relative
+# order of the existing pairs, so the result is the tree of a full rebuild.
+# Like phylogenetic_tree.py the tree is built over one representative per
+# sequence, see duplicates.py. If a new organism takes over the representative
+# of existing ones, or the spanning tree was written with --keep-duplicates,
+# the old spanning tree is not one over the current representatives and the
+# tree is rebuilt from all their scores.
+
+
+def add_species(scores:dict, organisms:dict, spanning_edges:list, scoring_model, workers=1, chunk_size=64, keep_duplicates=False):
+    # Returns (scores of all pairs, groups of duplicates, candidate edges over
+    # the representatives, new names). Organisms that do not appear in the
+    # existing scores are the new ones.
+    species = list(organisms.keys())
+    known_names = set(itertools.chain.from_iterable(k.split("_") for k in scores))
+    new_names = [name for name in species if name not in known_names]
+    new_set = set(new_names)
+    representatives, groups = group_duplicates(organisms, keep_duplicates)
+    representative_species = list(representatives)
+
+    new_pairs = [(name1, name2) for name1, name2 in itertools.combinations(representative_species, 2) if name1 in new_set or name2 in new_set]
+    new_scores = score_pairs(representatives, new_pairs, scoring_model, workers, chunk_size)
+
+    # the score of a sequence with itself is the one of two existing copies,
+    # only groups without two existing names need an alignment
+    self_scores = {}
+    for representative, names in groups.items():
+        known = [name for name in names if name in known_names]
+        if len(names) > 1 and len(known) > 1:
+            self_scores[representative+"_"+representative] = scores.get(known[0]+"_"+known[1], scores.get(known[1]+"_"+known[0]))
+    missing = [(representative, representative) for representative, names in groups.items() if len(names) > 1 and representative+"_"+representative not in self_scores]
+    self_scores.update(score_pairs(representatives, missing, scoring_model, workers, chunk_size))
+
+    # every pair in combinations order, as a full run writes them
+    representative_scores = {**representative_scores_of(scores, groups), **new_scores}
+    all_scores = expand_scores(species, groups, representative_scores, self_scores)
+
+    if all(name1 in groups and name2 in groups for name1, name2, _ in spanning_edges):
+        edges = candidate_edges(representative_species, spanning_edges, new_scores)
+    else:
+        edges = edges_from_scores(representative_scores, representative_species)
+    return all_scores, groups, edges, new_names
+
+
+def candidate_edges(species:list, spanning_edges:list, new_scores:dict):
+    # the old spanning tree and the new pairs as (i, j, score) edges, i < j
+    index = {name: i for i, name in enumerate(species)}
+    edges = [(min(index[name1], index[name2]), max(index[name1], index[name2]), value) for name1, name2, value in spanning_edges]
+    return edges + edges_from_scores(new_scores, species)
+
+
+def build_tree(species:list, groups:dict, edges:list, top):
+    # Returns (tree, root, spanning edges of the representatives as (name1,
+    # name2, score)). edges index list(groups), top is the value of the leaves.
+    representative_species = list(groups)
+    spanning = sparse_single_linkage_edges(len(representative_species), edges)
+    tree, root = tree_from_edges(Tree(), species, expand_edges(species, groups, spanning, top))
+    return tree, root, [(representative_species[i], representative_species[j], v) for i, j, v in spanning]
+
+
+def changed_clusters(old_clusters:dict, new_clusters:dict, new_names:list):
+    # Adding organisms can only merge single linkage clusters, so every cluster
+    # that changed contains one of the new organisms.
+    new_names = set(new_names)
+    changes = {}
+    for threshold, clusters in new_clusters.items():
+        added = [cluster for cluster in clusters if new_names.intersection(cluster)]
+        covered = set(itertools.chain.from_iterable(added))
+        removed = [cluster for cluster in old_clusters.get(str(threshold), []) if covered.intersection(cluster)]
+        changes[str(threshold)] = {"removed": removed, "added": added}
+    return changes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Adds organisms that are new in organisms.json to existing scores, tree and clusters without recomputing all pairs.')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='Number of worker processes, 1 runs the alignments serially.')
+    parser.add_argument('-c', '--chunk-size', type=int, default=64, help='Number of pairs sent to a worker at once.')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Build the tree over every organism, as phylogenetic_tree.py --keep-duplicates.')
+    parser.add_argument('--changes', default="./changed_clusters.json", help='JSON file for the clusters that changed.')
+    args = parser.parse_args()
+
+    with open(nw_json_file_path, 'r') as j:
+        nw_scores = json.loads(j.read())
+    with open(organisms_json_file_path, 'r') as j:
+        organisms = json.loads(j.read())
+    spanning_edges = read_spanning_edges(spanning_edges_output_path)
+    with open(clusters_output_path, 'r') as j:
+        old_clusters = json.loads(j.read())
+    with open(thresholds_file_path, 'r') as f:
+        thresholds = [int(line) for line in f]
+
+    scoring_model = load_scoring_model(blosum_json_file_path)
+    nw_scores, groups, edges, new_names = add_species(nw_scores, organisms, spanning_edges, scoring_model, args.workers, args.chunk_size, args.keep_duplicates)
+    top = leaf_value(representative_scores_of(nw_scores, groups), nw_scores)
+    tree_of_life, root, spanning_edges = build_tree(list(organisms.keys()), groups, edges, top)
+
+    clusters_by_threshold = ClusterEngine(root).clusters(thresholds)
+    clusters_dict = {}
+    for threshold in thresholds:
+        clusters_dict[threshold] = [cluster.tolist() for cluster in clusters_by_threshold[threshold]]
+
+    with open(nw_json_file_path, 'w') as j:
+        json.dump(nw_scores, j)
+    with open(newick_txt_file, 'w') as f, open(newick_distance_txt_file, 'w') as f_distance:
+        tree_of_life.write_newick(root, f, f_distance)
+    with open(clusters_output_path, 'w') as j:
+        json.dump(clusters_dict, j)
+    write_spanning_edges(spanning_edges_output_path, spanning_edges)
+    with open(args.changes, 'w') as j:
+        json.dump(changed_clusters(old_clusters, clusters_dict, new_names), j)
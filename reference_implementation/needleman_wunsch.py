@@ -1,21 +1,48 @@
 import json
 import numpy as np
 import itertools
+import argparse
+import os
+from multiprocessing import Pool
+from scoring_model import ScoringModel, load_scoring_model
+from score_cache import ScoreCache, sequence_digest, matrix_digest
+from score_matrix import scores_from_dict, write_score_matrix
+from duplicates import group_duplicates, duplicate_count, self_score_pairs, expand_scores
 
 blosum_json_file_path = "../starter_code/blosum62.json"
 organisms_json_file_path = "../starter_code/organisms.json"
+scores_output_path = "./organisms_scores_blosum62.json"
 
-with open(blosum_json_file_path, 'r') as j:
-    blosum = json.loads(j.read())
+# returned instead of a score when a cutoff proves the pair cannot reach it
+BELOW_CUTOFF = None
+# stands for minus infinity in the integer engines, far enough from the int32
+# limits that adding scores to it can not overflow
+NEG_INF = -(2**30)
 
-with open(organisms_json_file_path, 'r') as j:
-    organisms = json.loads(j.read())
 
-def needleman_wunsch(seq1: str, seq2:str, switch_cost:dict):
+def needleman_wunsch(seq1: str, seq2:str, switch_cost:dict, engine="linear", cutoff=None):
+    if cutoff is not None:
+        # only the row engine can stop early, the score it returns is the same
+        model = as_scoring_model(switch_cost)
+        return needleman_wunsch_cutoff(model.encode(seq1), model.encode(seq2), model, cutoff)
+    if engine == "vector":
+        return needleman_wunsch_vector(seq1, seq2, switch_cost)
+    elif engine == "linear":
+        model = as_scoring_model(switch_cost)
+        return needleman_wunsch_rows(model.encode(seq1), model.encode(seq2), model)
+    elif engine == "banded":
+        model = as_scoring_model(switch_cost)
+        return needleman_wunsch_banded(model.encode(seq1), model.encode(seq2), model)
+    elif engine != "loop":
+        raise ValueError(f"Unknown Needleman-Wunsch engine: {engine}")
+
+    # Original full-matrix engine, only run when asked for by name. It keeps all
+    # of M as float64 and has no traceback either, it stays as the reference
+    # the other engines are checked against. Alignments come from alignment.py.
     # algorithm adapted from https://bostjan-cigan.medium.com/using-the-needleman-wunsch-algorithm-to-draw-evolutionary-trees-90d9db149413
-    m = len(seq1)+1 
-    n = len(seq2)+1 
- 
+    m = len(seq1)+1
+    n = len(seq2)+1
+
     M = np.zeros((m, n))
 
     M[0][0] = 0
@@ -31,18 +58,478 @@ def needleman_wunsch(seq1: str, seq2:str, switch_cost:dict):
             delete2 = M[i][j-1]+ switch_cost[seq2[j-1]]
 
             M[i][j] = max(match, delete1, delete2)
- 
+
     return M[-1][-1]
 
-all_animals = list(organisms.keys())
-all_pairs = itertools.combinations(all_animals, 2)
 
-all_scores = {}
-for pair in all_pairs:
-    seq1 = organisms.get(pair[0])
-    seq2 = organisms.get(pair[1])
-    NW = needleman_wunsch(seq1, seq2, blosum)
-    all_scores[pair[0]+"_"+pair[1]] = int(NW)
+def needleman_wunsch_vector(seq1: str, seq2:str, switch_cost):
+    model = as_scoring_model(switch_cost)
+    return needleman_wunsch_encoded(model.encode(seq1), model.encode(seq2), model)
+
+
+def as_scoring_model(switch_cost):
+    if isinstance(switch_cost, ScoringModel):
+        return switch_cost
+    return ScoringModel.from_blosum_dict(switch_cost)
+
+
+def needleman_wunsch_encoded(codes1, codes2, model:ScoringModel):
+    # Same recurrence as the loop engine, but every anti-diagonal i+j=d of M is
+    # computed at once. All cells of a diagonal depend only on the two previous
+    # diagonals, so they can be filled with a single NumPy expression.
+    m = len(codes1)
+    n = len(codes2)
+
+    codes1 = codes1.astype(np.intp)
+    codes2 = codes2.astype(np.intp)
+    gap1 = model.gap_costs[codes1].astype(np.int32)
+    gap2 = model.gap_costs[codes2].astype(np.int32)
+
+    # first column and first row of M
+    border1 = np.concatenate(([0], np.cumsum(gap1))).astype(np.int32)
+    border2 = np.concatenate(([0], np.cumsum(gap2))).astype(np.int32)
+
+    if m == 0 or n == 0:
+        return int(border1[m] + border2[n])
+
+    # diagonals are stored by row index i, so M[i][d-i] lives in diag[i]
+    diag_prev2 = np.zeros(m+1, dtype=np.int32)
+    diag_prev1 = np.zeros(m+1, dtype=np.int32)
+    diag_prev1[0] = border2[1]
+    diag_prev1[1] = border1[1]
+
+    for d in range(2, m+n+1):
+        diag = np.zeros(m+1, dtype=np.int32)
+        lo = max(1, d-n)
+        hi = min(m, d-1)
+        i = np.arange(lo, hi+1)
+        j = d - i
+
+        match = diag_prev2[i-1] + model.substitution[codes1[i-1], codes2[j-1]]
+        delete1 = diag_prev1[i-1] + gap1[i-1]
+        delete2 = diag_prev1[i] + gap2[j-1]
+        diag[lo:hi+1] = np.maximum(match, np.maximum(delete1, delete2))
+
+        if d <= n:
+            diag[0] = border2[d]
+        if d <= m:
+            diag[d] = border1[d]
+
+        diag_prev2, diag_prev1 = diag_prev1, diag
+
+    return int(diag_prev1[m])
+
+
+def needleman_wunsch_rows(codes1, codes2, model:ScoringModel, cutoff=None):
+    if cutoff is not None:
+        return needleman_wunsch_cutoff(codes1, codes2, model, cutoff)
+    return int(needleman_wunsch_last_row(codes1, codes2, model)[-1])
+
+
+def needleman_wunsch_last_row(codes1, codes2, model:ScoringModel):
+    # Score-only engine with memory linear in len(seq2): only the previous and
+    # the current row of M are kept, as int32. Returns the last row, M[-1][j]
+    # is the score of aligning seq1 with the first j residues of seq2.
+    # Within a row M[i][j] = max(T[j], M[i][j-1] + gap2[j-1]) where T holds the
+    # match and delete1 moves. Subtracting the first row G = M[0] turns that
+    # into a running maximum: M[i] = maximum.accumulate(T - G) + G.
+    codes1, gap1, profile, first_row = _row_inputs(codes1, codes2, model)
+    previous_row = first_row.copy()
+    current_row = np.empty_like(previous_row)
+    for i in range(len(codes1)):
+        _row_step(previous_row, current_row, first_row, profile[codes1[i]], gap1[i])
+        previous_row, current_row = current_row, previous_row
+
+    return previous_row
+
+
+def _row_inputs(codes1, codes2, model:ScoringModel):
+    # Returns (codes1, gap1, profile, first_row) for the row engines, profile
+    # holds the substitution scores of every alphabet symbol against seq2.
+    codes1 = codes1.astype(np.intp)
+    codes2 = codes2.astype(np.intp)
+    gap1 = model.gap_costs[codes1].astype(np.int32)
+    gap2 = model.gap_costs[codes2].astype(np.int32)
+    profile = model.substitution[:, codes2].astype(np.int32)
+    first_row = np.zeros(len(codes2)+1, dtype=np.int32)
+    np.cumsum(gap2, out=first_row[1:])
+    return codes1, gap1, profile, first_row
+
+
+def _row_step(previous_row, current_row, first_row, substitutions, gap):
+    # writes the next row of M into current_row, substitutions and gap belong
+    # to the residue of seq1 of that row
+    current_row[0] = previous_row[0] + gap
+    np.maximum(previous_row[:-1] + substitutions, previous_row[1:] + gap, out=current_row[1:])
+    current_row -= first_row
+    np.maximum.accumulate(current_row, out=current_row)
+    current_row += first_row
+
+
+def _residue_bounds(codes, other_codes, substitution, gap_costs):
+    # Twice an upper bound of what every residue can add to the score. A match
+    # of a and b scores at most (best[a] + best[b]) / 2, a gap costs gap[a], so
+    # a residue adds at most max(best[a], 2*gap[a]). best only looks at the
+    # residues present in the other sequence. A match of seq1 residue a with
+    # seq2 residue b scores substitution[a, b], the matrix need not be
+    # symmetric, so the bounds of seq2 are taken from its transpose.
+    best = substitution.astype(np.int64)[codes][:, np.unique(other_codes)].max(axis=1, initial=NEG_INF)
+    return np.maximum(best, 2*gap_costs[codes].astype(np.int64))
+
+
+def _suffix_sums(values):
+    sums = np.zeros(len(values)+1, dtype=np.int64)
+    np.cumsum(values[::-1], out=sums[-2::-1])
+    return sums
+
+
+def needleman_wunsch_cutoff(codes1, codes2, model:ScoringModel, cutoff:int):
+    # Row engine of needleman_wunsch_last_row that gives up on pairs which
+    # cannot reach cutoff. Every path crosses row i at some cell (i, j), so
+    # twice the final score is at most max_j 2*M[i][j] + remaining2[j] plus
+    # remaining1[i], the bounds of the residues still to align. Returns the
+    # exact score when it reaches the cutoff and BELOW_CUTOFF otherwise.
+    # Deleting residue i keeps M[i+1][j] >= M[i][j] + gap1[i], so one row lowers
+    # the bound by at most max_drop and the next check can wait until the
+    # slack above the cutoff is used up.
+    codes1, gap1, profile, first_row = _row_inputs(codes1, codes2, model)
+    residue_bounds1 = _residue_bounds(codes1, codes2, model.substitution, model.gap_costs)
+    remaining1 = _suffix_sums(residue_bounds1)
+    remaining2 = _suffix_sums(_residue_bounds(codes2, codes1, model.substitution.T, model.gap_costs))
+    max_drop = max(1, int((residue_bounds1 - 2*gap1).max(initial=0)))
+    doubled_cutoff = 2*cutoff
+    next_check = 0
+
+    previous_row = first_row.copy()
+    current_row = np.empty_like(previous_row)
+    for i in range(len(codes1)):
+        if i == next_check:
+            slack = int((2*previous_row.astype(np.int64) + remaining2).max()) + int(remaining1[i]) - doubled_cutoff
+            if slack < 0:
+                return BELOW_CUTOFF
+            next_check = i + slack//max_drop + 1
+        _row_step(previous_row, current_row, first_row, profile[codes1[i]], gap1[i])
+        previous_row, current_row = current_row, previous_row
+
+    score = int(previous_row[-1])
+    return score if score >= cutoff else BELOW_CUTOFF
+
+
+class TargetBlock:
+    # A block of target sequences prepared for needleman_wunsch_one_to_many.
+    # Target k is lane k of every array, lanes are the last axis so every
+    # NumPy call of a row step works on contiguous runs of lanes. Targets are
+    # padded to the longest one, the padding never reaches the cells a shorter
+    # target is scored from, since a cell only depends on cells to its left and
+    # above. profile[a] holds the substitution scores of residue a against every
+    # target position, it is built once per block and reused for every query.
+
+    def __init__(self, targets:list, model:ScoringModel):
+        self.lengths = np.array([len(t) for t in targets], dtype=np.intp)
+        width = int(self.lengths.max()) if len(targets) else 0
+        codes = np.zeros((width, len(targets)), dtype=np.intp)
+        for k, target in enumerate(targets):
+            codes[:len(target), k] = target
+        self.gap = model.gap_costs[codes].astype(np.int32)
+        self.profile = model.substitution[:, codes].astype(np.int32)
+        self.first_row = np.zeros((width+1, len(targets)), dtype=np.int32)
+        np.cumsum(self.gap, axis=0, out=self.first_row[1:])
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+def needleman_wunsch_one_to_many(codes1, block:TargetBlock, model:ScoringModel, start=0):
+    # Scores of seq1 against targets start.. of the block. The row step of
+    # needleman_wunsch_last_row is done for all lanes at once, the running
+    # maximum along a row becomes an elementwise maximum between consecutive
+    # rows of lanes.
+    codes1 = np.asarray(codes1, dtype=np.intp)
+    gap1 = model.gap_costs[codes1].astype(np.int32)
+    first_row = block.first_row[:, start:]
+    profile = block.profile[:, :, start:]
+
+    previous_row = first_row.copy()
+    current_row = np.empty_like(previous_row)
+    diagonal = np.empty_like(previous_row[1:])
+    for i in range(len(codes1)):
+        np.add(previous_row[:-1], profile[codes1[i]], out=diagonal)
+        np.add(previous_row, gap1[i], out=current_row)
+        np.maximum(current_row[1:], diagonal, out=current_row[1:])
+        current_row -= first_row
+        np.maximum.accumulate(current_row, axis=0, out=current_row)
+        current_row += first_row
+        previous_row, current_row = current_row, previous_row
+
+    return previous_row[block.lengths[start:], np.arange(previous_row.shape[1])]
+
+
+def needleman_wunsch_banded(codes1, codes2, model:ScoringModel, initial_band_width=16):
+    # Banded version of needleman_wunsch_rows. Only cells with
+    # min(0, n-m) - w <= j - i <= max(0, n-m) + w are filled. The banded optimum
+    # is a lower bound of the real score, and band_upper_bounds() gives an upper
+    # bound for every path that leaves the band. The band is widened until the
+    # banded score reaches that bound, which makes the result exact.
+    m = len(codes1)
+    n = len(codes2)
+    if m == 0 or n == 0:
+        return needleman_wunsch_rows(codes1, codes2, model)
+
+    outside_bounds = band_upper_bounds(codes1, codes2, model)
+    score = _ungapped_score(codes1, codes2, model)
+    band_width = None
+    while True:
+        # smallest band for which no path outside of it can beat the known score
+        wide_enough = np.nonzero(outside_bounds <= 2*score)[0]
+        required_width = int(wide_enough[0]) if len(wide_enough) else len(outside_bounds)
+        if band_width is None:
+            band_width = min(required_width, initial_band_width)
+        elif required_width <= band_width:
+            return score
+        else:
+            band_width = max(required_width, 2*band_width)
+        score = _banded_score(codes1, codes2, model, band_width)
+
+
+def _ungapped_score(codes1, codes2, model:ScoringModel):
+    # score of aligning both sequences from the start without gaps and gapping
+    # the tail of the longer one, a cheap lower bound of the optimum
+    k = min(len(codes1), len(codes2))
+    codes1 = codes1.astype(np.intp)
+    codes2 = codes2.astype(np.intp)
+    matched = model.substitution[codes1[:k], codes2[:k]].astype(np.int64).sum()
+    tail = model.gap_costs[codes1[k:]].astype(np.int64).sum() + model.gap_costs[codes2[k:]].astype(np.int64).sum()
+    return int(matched + tail)
+
+
+def band_upper_bounds(codes1, codes2, model:ScoringModel):
+    # bounds[w] is twice an upper bound of the score of any path leaving the band
+    # of width w, NEG_INF once the band covers the whole matrix.
+    # A match of a and b scores at most (best1[a] + best2[b]) / 2, where best1[a]
+    # is the best score of a against any residue of seq2 and vice versa. The
+    # matrix need not be symmetric, so best2 is taken from its transpose. Every
+    # gap replaces that half-score by the gap cost. Leaving the band needs a known
+    # minimal number of gaps in each sequence, and the cheapest residues to gap
+    # give the bound.
+    m = len(codes1)
+    n = len(codes2)
+    codes1 = codes1.astype(np.intp)
+    codes2 = codes2.astype(np.intp)
+    substitution = model.substitution.astype(np.int64)
+    best1 = substitution[codes1][:, np.unique(codes2)].max(axis=1)
+    best2 = substitution.T[codes2][:, np.unique(codes1)].max(axis=1)
+    penalties1 = _min_gap_penalties(best1 - 2*model.gap_costs[codes1].astype(np.int64))
+    penalties2 = _min_gap_penalties(best2 - 2*model.gap_costs[codes2].astype(np.int64))
+    total = best1.sum() + best2.sum()
+
+    delta = n - m
+    widths = np.arange(0, m+n+2)
+    # leaving above the band: j - i reaches max(0, delta) + w + 1
+    insertions_above = max(0, delta) + widths + 1
+    deletions_above = insertions_above - delta
+    # leaving below the band: j - i reaches min(0, delta) - w - 1
+    deletions_below = 1 - min(0, delta) + widths
+    insertions_below = deletions_below + delta
+
+    bounds = np.full(len(widths), NEG_INF, dtype=np.int64)
+    for deletions, insertions in ((deletions_above, insertions_above), (deletions_below, insertions_below)):
+        possible = (deletions <= m) & (insertions <= n)
+        side = total - penalties1[np.minimum(deletions, m)] - penalties2[np.minimum(insertions, n)]
+        bounds = np.where(possible, np.maximum(bounds, side), bounds)
+    return bounds
+
+
+def _min_gap_penalties(penalties):
+    # result[k] is the smallest total penalty of gapping at least k residues
+    prefix = np.concatenate(([0], np.cumsum(np.sort(penalties))))
+    return np.minimum.accumulate(prefix[::-1])[::-1]
+
+
+def _banded_score(codes1, codes2, model:ScoringModel, band_width):
+    m = len(codes1)
+    n = len(codes2)
+    low = min(0, n-m) - band_width
+    high = max(0, n-m) + band_width
+
+    codes1, gap1, profile, first_row = _row_inputs(codes1, codes2, model)
+    previous_row = np.full(n+1, NEG_INF, dtype=np.int32)
+    previous_row[:high+1] = first_row[:high+1]
+    current_row = np.empty_like(previous_row)
+    for i in range(1, m+1):
+        lo = max(0, i+low)
+        hi = min(n, i+high)
+        start = max(lo, 1)
+        if lo == 0:
+            current_row[0] = previous_row[0] + gap1[i-1]
+        np.maximum(previous_row[start-1:hi] + profile[codes1[i-1], start-1:hi],
+                   previous_row[start:hi+1] + gap1[i-1], out=current_row[start:hi+1])
+        band = current_row[lo:hi+1]
+        band -= first_row[lo:hi+1]
+        np.maximum.accumulate(band, out=band)
+        band += first_row[lo:hi+1]
+        # the next row reads one cell past the band, which must not be a stale value
+        if hi < n:
+            current_row[hi+1] = NEG_INF
+        previous_row, current_row = current_row, previous_row
+
+    return int(previous_row[n])
+
+
+# Worker state for the process pool. Sequences and scoring matrix are sent once
+# per worker through the pool initializer, tasks only carry pair indices.
+_worker_sequences = None
+_worker_model = None
+_worker_cutoff = None
+
+
+def _init_worker(encoded_sequences:list, scoring_model:ScoringModel, cutoff=None):
+    global _worker_sequences, _worker_model, _worker_cutoff
+    _worker_sequences = encoded_sequences
+    _worker_model = scoring_model
+    _worker_cutoff = cutoff
+
+
+def _score_pair(pair:tuple):
+    i, j = pair
+    return needleman_wunsch_rows(_worker_sequences[i], _worker_sequences[j], _worker_model, _worker_cutoff)
+
+
+def _score_block(block_range:tuple):
+    # all pairs (i, j), i < j, whose second sequence falls into the block
+    block_start, block_end = block_range
+    block = TargetBlock(_worker_sequences[block_start:block_end], _worker_model)
+    scores = []
+    for i in range(block_end - 1):
+        start = max(0, i + 1 - block_start)
+        for offset, score in enumerate(needleman_wunsch_one_to_many(_worker_sequences[i], block, _worker_model, start)):
+            scores.append((i, block_start + start + offset, int(score)))
+    return scores
+
+
+def score_all_pairs_batched(organisms:dict, scoring_model:ScoringModel, workers=1, block_size=32, cutoff=None):
+    # Same result as score_all_pairs. The targets are cut into blocks of
+    # block_size sequences, every sequence before a block is aligned against
+    # it as a query with needleman_wunsch_one_to_many. Blocks are the tasks of
+    # the pool, the block stays in cache while all its queries run. The lanes
+    # of a block cannot stop on their own, with a cutoff the pairs below it
+    # are only dropped from the result.
+    all_animals = list(organisms.keys())
+    encoded_sequences = [scoring_model.encode(organisms[name]) for name in all_animals]
+    n = len(all_animals)
+    blocks = [(start, min(start + block_size, n)) for start in range(1, n, block_size)]
+
+    scores = {}
+    if workers <= 1:
+        _init_worker(encoded_sequences, scoring_model)
+        results = map(_score_block, blocks)
+    else:
+        pool = Pool(processes=workers, initializer=_init_worker, initargs=(encoded_sequences, scoring_model))
+        # later blocks hold more pairs, they are started first
+        results = pool.imap_unordered(_score_block, blocks[::-1])
+    try:
+        for block_scores in results:
+            for i, j, score in block_scores:
+                scores[(i, j)] = score
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+
+    return _collect_scores(all_animals, itertools.combinations(range(n), 2), (scores[pair] for pair in itertools.combinations(range(n), 2)), cutoff)
+
+
+def score_all_pairs(organisms:dict, scoring_model:ScoringModel, workers=1, chunk_size=64, cache:ScoreCache=None, cutoff=None):
+    all_animals = list(organisms.keys())
+    return score_pairs(organisms, itertools.combinations(all_animals, 2), scoring_model, workers, chunk_size, cache, cutoff)
+
+
+def score_pairs(organisms:dict, pairs, scoring_model:ScoringModel, workers=1, chunk_size=64, cache:ScoreCache=None, cutoff=None):
+    # With a cutoff the result is a partial score set, pairs that cannot reach
+    # the cutoff are left out.
+    all_animals = list(organisms.keys())
+    position = {name: i for i, name in enumerate(all_animals)}
+    encoded_sequences = [scoring_model.encode(organisms[name]) for name in all_animals]
+    index_pairs = ((position[name1], position[name2]) for name1, name2 in pairs)
+
+    if cache is None:
+        index_pairs, pairs_to_score = itertools.tee(index_pairs)
+        scores = _score_pairs(pairs_to_score, encoded_sequences, scoring_model, workers, chunk_size, cutoff)
+        return _collect_scores(all_animals, index_pairs, scores, cutoff)
+
+    # only the pairs missing from the cache are aligned
+    matrix = matrix_digest(scoring_model)
+    digests = [sequence_digest(organisms[name]) for name in all_animals]
+    index_pairs = list(index_pairs)
+    keys = [ScoreCache.make_key(digests[i], digests[j], matrix) for i, j in index_pairs]
+    cached = cache.get_many(keys)
+    missing = [pair for pair, key in zip(index_pairs, keys) if key not in cached]
+    computed = {}
+    for (i, j), score in zip(missing, _score_pairs(missing, encoded_sequences, scoring_model, workers, chunk_size, cutoff)):
+        # abandoned pairs have no exact score to cache
+        if score is not BELOW_CUTOFF:
+            computed[ScoreCache.make_key(digests[i], digests[j], matrix)] = score
+    cache.put_many(computed)
+    cached.update(computed)
+    return _collect_scores(all_animals, index_pairs, (cached.get(key, BELOW_CUTOFF) for key in keys), cutoff)
+
+
+def _score_pairs(pairs, encoded_sequences:list, scoring_model:ScoringModel, workers, chunk_size, cutoff=None):
+    if workers <= 1:
+        _init_worker(encoded_sequences, scoring_model, cutoff)
+        yield from map(_score_pair, pairs)
+        return
+
+    with Pool(processes=workers, initializer=_init_worker, initargs=(encoded_sequences, scoring_model, cutoff)) as pool:
+        # imap keeps the order of the pairs, so the output matches the serial path
+        yield from pool.imap(_score_pair, pairs, chunksize=chunk_size)
+
+
+def _collect_scores(all_animals:list, index_pairs, scores, cutoff=None):
+    all_scores = {}
+    for (i, j), score in zip(index_pairs, scores):
+        if score is BELOW_CUTOFF or (cutoff is not None and score < cutoff):
+            continue
+        all_scores[all_animals[i]+"_"+all_animals[j]] = int(score)
+    return all_scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Computes Needleman-Wunsch scores for all pairs of organisms.')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='Number of worker processes, 1 runs the alignments serially.')
+    parser.add_argument('-c', '--chunk-size', type=int, default=64, help='Number of pairs sent to a worker at once.')
+    parser.add_argument('-e', '--engine', choices=['batch', 'pair'], default='batch', help='Align one sequence against blocks of targets at once, or every pair on its own. --cache always aligns pair by pair.')
+    parser.add_argument('-b', '--block-size', type=int, default=32, help='Number of target sequences in a block of the batch engine.')
+    parser.add_argument('--cache', help='SQLite file with cached scores, only pairs missing from it are aligned.')
+    parser.add_argument('--cache-size', type=int, help='Maximum number of scores kept in the cache, least recently used ones are evicted.')
+    parser.add_argument('--binary-output', help='Also write the scores in the binary format of score_matrix.py to this file.')
+    parser.add_argument('--cutoff', type=int, help='Only keep pairs scoring at least this much, e.g. the lowest threshold. The pair engine stops aligning a pair as soon as it cannot reach it.')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Align every copy of identical sequences instead of one representative per sequence.')
+    args = parser.parse_args()
+
+    scoring_model = load_scoring_model(blosum_json_file_path)
+
+    with open(organisms_json_file_path, 'r') as j:
+        organisms = json.loads(j.read())
+
+    all_animals = list(organisms.keys())
+    representatives, groups = group_duplicates(organisms, args.keep_duplicates)
+    if duplicate_count(groups):
+        print(f"{duplicate_count(groups)} duplicate sequences, aligning {len(representatives)} of {len(all_animals)} organisms")
+
+    cache = ScoreCache(args.cache, max_entries=args.cache_size) if args.cache else None
+    if args.engine == 'batch' and cache is None:
+        representative_scores = score_all_pairs_batched(representatives, scoring_model, workers=args.workers, block_size=args.block_size, cutoff=args.cutoff)
+    else:
+        representative_scores = score_all_pairs(representatives, scoring_model, workers=args.workers, chunk_size=args.chunk_size, cache=cache, cutoff=args.cutoff)
+    self_scores = score_pairs(representatives, self_score_pairs(groups), scoring_model, cache=cache, cutoff=args.cutoff)
+    if cache is not None:
+        cache.close()
+    all_scores = expand_scores(all_animals, groups, representative_scores, self_scores)
 
-with open("./organisms_scores_blosum62.json", 'w') as j:
-    json.dump(all_scores, j)
+    with open(scores_output_path, 'w') as j:
+        json.dump(all_scores, j)
+    if args.binary_output:
+        # pairs below the cutoff are stored as cutoff - 1, the floor phylogenetic_tree.py
+        # --binary-scores joins them at, pass it the same --cutoff
+        fill = None if args.cutoff is None else args.cutoff - 1
+        write_score_matrix(args.binary_output, scores_from_dict(all_scores, all_animals, fill))
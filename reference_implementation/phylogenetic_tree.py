@@ -1,4 +1,12 @@
+import io
 import json
+import bisect
+import argparse
+import numpy as np
+from score_matrix import PairwiseScores, scores_from_dict, load_score_matrix
+from array_tree import ArrayTree
+from tree_utils import NEWICK_CHUNK_SIZE, find, write_newick
+from duplicates import group_duplicates, representative_scores_of, leaf_value, expand_edges, duplicate_scores
 BLOSUM_VERSION = 50
 
 nw_json_file_path = f"./organisms_scores_blosum{BLOSUM_VERSION}.json"
@@ -7,6 +15,7 @@ newick_txt_file = f"./tree_blosum{BLOSUM_VERSION}_newick.nw"
 newick_distance_txt_file = f"./tree_blosum{BLOSUM_VERSION}_newick_with_distance.nw"
 thresholds_file_path=  "../starter_code/thresholds.txt"
 clusters_output_path = f"./clusters_for_blosum{BLOSUM_VERSION}.json"
+spanning_edges_output_path = f"./spanning_edges_blosum{BLOSUM_VERSION}.json"
 
 
 class Node:
@@ -29,6 +38,18 @@ class Node:
     def update_distance(self, distance):
         self.distance = distance
 
+def _node_children(node:Node):
+    return node.left, node.right
+
+
+def _node_name(node:Node):
+    return node.name
+
+
+def _node_distance(node:Node):
+    return node.distance
+
+
 class Tree:
 
     def createNode(self, name, value, parent=None, root=None, left=None, right=None, is_leaf=False):
@@ -55,13 +76,18 @@ class Tree:
 
     def make_newick(self, node, distance=False):
 
-        newick = ""
+        out = io.StringIO()
         if distance:
-            newick = self.traverse_newick_with_distance(node, newick)
+            self.write_newick(node, None, out)
         else:
-            newick = self.traverse_newick(node, newick)
-        return f"{newick};"
-    
+            self.write_newick(node, out)
+        return out.getvalue()
+
+    def write_newick(self, root_node, out=None, out_with_distance=None, chunk_size=NEWICK_CHUNK_SIZE):
+        # Writes the plain and/or the with-distance Newick of the tree in a single
+        # pass, see tree_utils.write_newick.
+        write_newick(root_node, _node_children, _node_name, _node_distance, out, out_with_distance, chunk_size)
+
     def traverse_newick(self, root_node, newick):
 
         if root_node.left and not root_node.right:
@@ -99,10 +125,13 @@ class UnionFind:
         
     def find(self, key):
 
-        if self.parent[key] == key:
-            return key
-          
-        return self.find(self.parent[key])
+        root = key
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # path compression, every visited key points straight to the root
+        while self.parent[key] != root:
+            self.parent[key], key = root, self.parent[key]
+        return root
     
     def unite(self, key1, key2):
       
@@ -132,9 +161,16 @@ def init_tracking_cache(init_dict:dict, main_tree:Tree, nw_scores_sorted:dict):
 
 
 
-def create_tree(tree:Tree, nw_scores_sorted:dict, tracking_cache:dict, union_find:UnionFind):
+def create_tree(tree:Tree, nw_scores_sorted:dict, tracking_cache:dict, union_find:UnionFind, floor=None, merges:list=None):
+    # nw_scores_sorted may be a partial score set, e.g. computed with a cutoff
+    # in needleman_wunsch.py. The clusters left after its pairs are joined under
+    # nodes with value floor, which has to be below every threshold used later
+    # for the clusters to be exact. Every merge is appended to merges as
+    # (specie1, specie2, value) when a list is given.
     node_counter = 1
     for k, v in nw_scores_sorted.items():
+        if v is None:
+            continue
         species = k.split("_")
         specie1 = species[0]
         specie2 = species[1]
@@ -146,14 +182,160 @@ def create_tree(tree:Tree, nw_scores_sorted:dict, tracking_cache:dict, union_fin
         if species1_root!=species2_root:
             union_find.unite(specie1, specie2)
             node_counter = node_counter+1
+            if merges is not None:
+                merges.append((specie1, specie2, v))
             new_parent_node = tree.createNode(name = '', value = v, left=species1_root_node, right=species2_root_node)
             species1_root_node.update_distance(species1_root_node.value - new_parent_node.value)
             species2_root_node.update_distance(species2_root_node.value - new_parent_node.value)
             tracking_cache = tree.change_root_for_all_children(current_node=species1_root_node, new_root=new_parent_node, fast_track = tracking_cache)
             tracking_cache = tree.change_root_for_all_children(current_node=species2_root_node, new_root=new_parent_node, fast_track = tracking_cache)
+
+    cluster_roots = {}
+    for specie in union_find.parent:
+        cluster_roots.setdefault(union_find.find(specie), specie)
+    if len(cluster_roots) > 1:
+        if floor is None:
+            raise ValueError(f"Scores do not connect all species ({len(cluster_roots)} clusters left), pass floor to join them")
+        species = list(cluster_roots.values())
+        for specie1, specie2 in zip(species, species[1:]):
+            species1_root_node = tracking_cache[specie1]
+            species2_root_node = tracking_cache[specie2]
+            union_find.unite(specie1, specie2)
+            if merges is not None:
+                merges.append((specie1, specie2, floor))
+            new_parent_node = tree.createNode(name = '', value = floor, left=species1_root_node, right=species2_root_node)
+            species1_root_node.update_distance(species1_root_node.value - new_parent_node.value)
+            species2_root_node.update_distance(species2_root_node.value - new_parent_node.value)
+            tracking_cache = tree.change_root_for_all_children(current_node=species1_root_node, new_root=new_parent_node, fast_track = tracking_cache)
+            tracking_cache = tree.change_root_for_all_children(current_node=species2_root_node, new_root=new_parent_node, fast_track = tracking_cache)
     new_parent_node.update_distance(0)
     return tree, new_parent_node, tracking_cache, union_find
 
+def single_linkage_edges(pairwise:PairwiseScores):
+    # Maximum spanning tree of the scores with dense Prim, O(n^2) time and O(n)
+    # memory besides the scores. Ties are broken by the position of the pair in
+    # the condensed array (combinations order), which is the order Kruskal in
+    # create_tree sees them after the stable sort, so both pick the same edges.
+    # Every edge gets the key score*pair_count - position, unique per pair.
+    n = len(pairwise.species)
+    pair_count = n*(n-1)//2 + 1
+    all_nodes = np.arange(n)
+    in_tree = np.zeros(n, dtype=bool)
+    best_key = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+    best_from = np.zeros(n, dtype=np.intp)
+
+    edges = []
+    u = 0
+    in_tree[u] = True
+    for _ in range(n-1):
+        low = np.minimum(u, all_nodes)
+        high = np.maximum(u, all_nodes)
+        positions = n*low - low*(low+1)//2 + high - low - 1
+        keys = np.asarray(pairwise.condensed)[positions].astype(np.int64)*pair_count - positions
+        improved = ~in_tree & (keys > best_key)
+        best_key[improved] = keys[improved]
+        best_from[improved] = u
+
+        u = int(np.argmax(np.where(in_tree, np.iinfo(np.int64).min, best_key)))
+        in_tree[u] = True
+        edges.append((best_key[u], min(u, best_from[u]), max(u, best_from[u])))
+
+    edges.sort(reverse=True)
+    return [(int(i), int(j), pairwise.get(pairwise.species[i], pairwise.species[j])) for _, i, j in edges]
+
+
+def sparse_single_linkage_edges(species_count:int, scored_edges, floor=None):
+    # Kruskal over a sparse candidate graph, scored_edges are (i, j, score) with
+    # i < j. Ties are broken by (i, j) like single_linkage_edges, so a graph
+    # that contains the maximum spanning tree gives the same edges. Components
+    # the graph leaves apart are joined by edges of score floor, by default just
+    # below the lowest score of the graph.
+    edges = sorted(scored_edges, key=lambda edge: (-edge[2], edge[0], edge[1]))
+    if floor is None:
+        floor = edges[-1][2] - 1 if edges else 0
+    union_find = list(range(species_count))
+
+    spanning_edges = []
+    for i, j, v in edges:
+        root1, root2 = find(union_find, i), find(union_find, j)
+        if root1 != root2:
+            union_find[root1] = root2
+            spanning_edges.append((i, j, v))
+
+    first = {}
+    for i in range(species_count):
+        first.setdefault(find(union_find, i), i)
+    components = sorted(first.values())
+    spanning_edges.extend((components[0], i, floor) for i in components[1:])
+    return spanning_edges
+
+
+def edges_from_scores(scores:dict, species:list):
+    # (i, j, score) edges with i < j of a possibly partial score dict
+    index = {name: i for i, name in enumerate(species)}
+    edges = []
+    for key, value in scores.items():
+        name1, name2 = key.split("_")
+        i, j = sorted((index[name1], index[name2]))
+        edges.append((i, j, value))
+    return edges
+
+
+def write_spanning_edges(path:str, spanning_edges:list):
+    # The merges of the tree as [name1, name2, score], in the order they were
+    # made. incremental_update.py rebuilds the tree from them and the new pairs.
+    with open(path, 'w') as j:
+        json.dump([[name1, name2, int(value)] for name1, name2, value in spanning_edges], j)
+
+
+def read_spanning_edges(path:str):
+    with open(path, 'r') as j:
+        return [tuple(edge) for edge in json.loads(j.read())]
+
+
+def create_tree_sparse(tree:Tree, species:list, scored_edges, floor=None):
+    # create_tree for a sparse candidate graph, e.g. the pairs kept by
+    # prefilter.py, see sparse_single_linkage_edges for the missing pairs
+    return tree_from_edges(tree, species, sparse_single_linkage_edges(len(species), scored_edges, floor))
+
+
+def create_tree_prim(tree:Tree, pairwise:PairwiseScores):
+    # Builds the same tree as create_tree from the spanning tree edges only.
+    return tree_from_edges(tree, pairwise.species, single_linkage_edges(pairwise))
+
+
+def tree_from_edges(tree:Tree, species:list, edges:list):
+    # Edges are (i, j, score) sorted by decreasing score. The union-find works
+    # on species indices and keeps the current cluster node of every set, so
+    # no subtree is walked again after a merge.
+    max_distance = edges[0][2]
+    nodes = []
+    for name in species:
+        node = tree.createNode(name=name, value=max_distance, is_leaf=True)
+        node.update_distance(max_distance)
+        nodes.append(node)
+
+    cluster_node = list(nodes)
+    union_find = list(range(len(nodes)))
+
+    for i, j, v in edges:
+        species1_root, species2_root = find(union_find, i), find(union_find, j)
+        species1_root_node = cluster_node[species1_root]
+        species2_root_node = cluster_node[species2_root]
+        new_parent_node = tree.createNode(name = '', value = v, left=species1_root_node, right=species2_root_node)
+        species1_root_node.update_distance(species1_root_node.value - new_parent_node.value)
+        species2_root_node.update_distance(species2_root_node.value - new_parent_node.value)
+        nodes.append(new_parent_node)
+        union_find[species1_root] = species2_root
+        cluster_node[species2_root] = new_parent_node
+    new_parent_node.update_distance(0)
+
+    # create_tree leaves every node pointing at the final root as its parent
+    for node in nodes[:-1]:
+        node.set_parent(new_parent_node)
+    return tree, new_parent_node
+
+
 def get_leaf_nodes(root):
     if root.is_leaf:
         return [root.name]
@@ -169,50 +351,238 @@ def get_leaf_nodes(root):
     return my_leafs
 
 
-def generate_clusters(tree_root:Node, threshold:int, all_clusters:list):
+def generate_clusters(tree_root:Node, threshold:int, all_clusters:list, cutoff=None, engine=None):
     if not tree_root:
         return
-    elif tree_root.value < threshold:
-        #If the threshold is not exceeded iteratively look starting from children
-        generate_clusters(tree_root.left, threshold, all_clusters)
-        generate_clusters(tree_root.right, threshold, all_clusters)
-    else:
-        # If the threshold is exceeded, create cluster starting from that node
-        cluster = get_leaf_nodes(tree_root)
-        all_clusters.append(cluster)
+    # a tree built from scores with a cutoff only knows the merges above it
+    if cutoff is not None and threshold < cutoff:
+        raise ValueError(f"Threshold {threshold} is below the cutoff {cutoff} of the scores")
+    # clusters are the nodes where the threshold is exceeded for the first time
+    # on the way down from the root, see ClusterEngine. Callers asking for
+    # several thresholds pass one engine (ClusterEngine or CutIndex) of
+    # tree_root instead of walking the tree again for every threshold.
+    if engine is None:
+        engine = ClusterEngine(tree_root)
+    clusters = engine.clusters([threshold])[threshold]
+    all_clusters.extend(cluster.tolist() for cluster in clusters)
     return all_clusters
 
-if __name__ == "__main__":
-
-    with open(nw_json_file_path, 'r') as j:
-        nw_scores = json.loads(j.read())
+class ClusterEngine:
+    # Answers generate_clusters for any number of thresholds at once. One
+    # iterative DFS (left child first, like get_leaf_nodes) lays the leaves out
+    # in leaf_order and records the range of leaves under every node, so a
+    # cluster is a slice of that shared array.
+    # generate_clusters stops at the first node with value >= threshold, so a
+    # node is a cluster exactly for the thresholds in
+    # (highest value of its ancestors, its own value].
+
+    def __init__(self, tree_root:Node):
+        leaf_names = []
+        self.leaf_position = {}
+        self.starts = []
+        self.ends = []
+        self.lows = []
+        self.highs = []
+        self.parents = []
+        stack = [(tree_root, float("-inf"), -1)]
+        while stack:
+            node, ancestors_value, parent = stack.pop()
+            if isinstance(node, int):
+                # every leaf under the node has been laid out
+                self.ends[node] = len(leaf_names)
+                continue
+            if not node:
+                continue
+
+            position = len(self.starts)
+            self.starts.append(len(leaf_names))
+            self.ends.append(len(leaf_names))
+            self.lows.append(ancestors_value)
+            self.highs.append(node.value)
+            self.parents.append(parent)
+            if node.is_leaf:
+                self.leaf_position[node.name] = position
+                leaf_names.append(node.name)
+                self.ends[position] = len(leaf_names)
+                continue
+
+            stack.append((position, None, None))
+            ancestors_value = max(ancestors_value, node.value)
+            stack.append((node.right, ancestors_value, position))
+            stack.append((node.left, ancestors_value, position))
+
+        self.leaf_order = np.array(leaf_names, dtype=object)
+
+    def clusters(self, thresholds:list):
+        sorted_thresholds = sorted(set(thresholds))
+        clusters_by_threshold = {threshold: [] for threshold in sorted_thresholds}
+        for start, end, low, high in zip(self.starts, self.ends, self.lows, self.highs):
+            first = bisect.bisect_right(sorted_thresholds, low)
+            last = bisect.bisect_right(sorted_thresholds, high)
+            if first < last:
+                cluster = self.leaf_order[start:end]
+                for threshold in sorted_thresholds[first:last]:
+                    clusters_by_threshold[threshold].append(cluster)
+        return clusters_by_threshold
+
+
+class CutIndex(ClusterEngine):
+    # O(log n) queries about the clusters at a threshold T. In a single linkage
+    # tree a node value is never lower than the value of its parent, so along
+    # the path from a leaf to the root the values only go down.
+    # - the clusters at T are the nodes with low < T <= high, so their number is
+    #   #(high >= T) - #(low >= T), two bisections over the sorted merge heights
+    # - the cluster of a leaf is its highest ancestor with value >= T, found
+    #   with binary lifting over the ancestor table
+    # - two leaves join at the value of their lowest common ancestor
+
+    def __init__(self, tree_root:Node):
+        super().__init__(tree_root)
+        # nodes whose interval is empty are never a cluster
+        used = [k for k in range(len(self.starts)) if self.lows[k] < self.highs[k]]
+        self.merge_heights = sorted(self.highs[k] for k in used)
+        self.sorted_lows = sorted(self.lows[k] for k in used)
+        self.values = np.array(self.highs)
+
+        node_count = len(self.parents)
+        parents = np.array(self.parents, dtype=np.int64)
+        root = int(np.nonzero(parents == -1)[0][0]) if node_count else 0
+        parents[parents == -1] = root
+        self.depths = np.zeros(node_count, dtype=np.int64)
+        # preorder puts every parent before its children
+        for k in range(node_count):
+            if k != root:
+                self.depths[k] = self.depths[parents[k]] + 1
+        self.ancestors = [parents]
+        while (1 << len(self.ancestors)) < max(node_count, 2):
+            self.ancestors.append(self.ancestors[-1][self.ancestors[-1]])
+
+    def cluster_count(self, threshold):
+        return (len(self.merge_heights) - bisect.bisect_left(self.merge_heights, threshold)) - \
+            (len(self.sorted_lows) - bisect.bisect_left(self.sorted_lows, threshold))
+
+    def cluster_node(self, name:str, threshold):
+        node = self.leaf_position[name]
+        if self.values[node] < threshold:
+            return None
+        for ancestors in reversed(self.ancestors):
+            ancestor = ancestors[node]
+            if self.values[ancestor] >= threshold:
+                node = ancestor
+        return int(node)
+
+    def cluster_of(self, name:str, threshold):
+        node = self.cluster_node(name, threshold)
+        if node is None:
+            return None
+        return self.leaf_order[self.starts[node]:self.ends[node]]
+
+    def join_threshold(self, name1:str, name2:str):
+        node1 = self.leaf_position[name1]
+        node2 = self.leaf_position[name2]
+        if self.depths[node1] < self.depths[node2]:
+            node1, node2 = node2, node1
+        difference = self.depths[node1] - self.depths[node2]
+        for level, ancestors in enumerate(self.ancestors):
+            if difference >> level & 1:
+                node1 = ancestors[node1]
+        if node1 != node2:
+            for ancestors in reversed(self.ancestors):
+                if ancestors[node1] != ancestors[node2]:
+                    node1 = ancestors[node1]
+                    node2 = ancestors[node2]
+            node1 = self.ancestors[0][node1]
+        return self.values[node1].item()
 
-    with open(organisms_json_file_path, 'r') as j:
-        organisms = json.loads(j.read())
 
-    nw_scores_sorted = {k: v for k, v in sorted(nw_scores.items(), key=lambda item: item[1], reverse=True)}
-    union_find_structure = UnionFind(organisms.keys())
-    tree_of_life = Tree()
-    tracking_cache = init_tracking_cache(organisms, tree_of_life, nw_scores_sorted)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Builds the phylogenetic tree and clusters from Needleman-Wunsch scores.')
+    parser.add_argument('-e', '--engine', choices=['prim', 'kruskal', 'arrays', 'sparse'], default='prim', help='Tree builder, dense Prim over a score matrix, Kruskal over all sorted pairs, Prim into an array-backed tree or Kruskal over the pairs present in the scores (e.g. from prefilter.py).')
+    parser.add_argument('--cutoff', type=int, help='Cutoff the scores were computed with (needleman_wunsch.py --cutoff). Missing pairs are treated as scoring below it, thresholds must not be lower.')
+    parser.add_argument('--binary-scores', help='Read the scores from this file in the binary format of score_matrix.py (needleman_wunsch.py --binary-output) instead of the JSON file. Only for -e prim and arrays.')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Build the tree over every organism instead of attaching identical sequences to one representative.')
+    args = parser.parse_args()
 
-    tree_of_life, root, tracking_cache, union_find_structure = create_tree(tree_of_life, nw_scores_sorted, tracking_cache, union_find_structure)
+    with open(thresholds_file_path, 'r') as f:
+        thresholds = [int(line) for line in f]
+    # missing pairs get a score just below the cutoff, merges at that score do
+    # not change the clusters of any threshold at or above the cutoff
+    floor = None
+    if args.cutoff is not None:
+        if min(thresholds) < args.cutoff:
+            parser.error(f"threshold {min(thresholds)} is below the cutoff {args.cutoff}")
+        floor = args.cutoff - 1
 
-    tree_newick = tree_of_life.make_newick(root)
-    tree_newick_with_distance = tree_of_life.make_newick(root, distance=True)
+    if args.binary_scores and args.engine not in ('prim', 'arrays'):
+        parser.error(f"--binary-scores needs -e prim or arrays, not {args.engine}")
 
-    with open(newick_txt_file, 'w') as f:
-        f.write(tree_newick)
-    with open(newick_distance_txt_file, 'w') as f:
-        f.write(tree_newick_with_distance)
+    with open(organisms_json_file_path, 'r') as j:
+        organisms = json.loads(j.read())
 
+    # the tree is built over one representative per sequence, identical
+    # sequences are attached to it with zero-length branches, see duplicates.py
+    species = list(organisms.keys())
+    representatives, groups = group_duplicates(organisms, args.keep_duplicates)
+    representative_species = list(representatives)
+
+    if args.binary_scores:
+        # memory mapped, pairs below a cutoff are already stored as cutoff - 1
+        all_pairwise = load_score_matrix(args.binary_scores)
+        if set(all_pairwise.species) != set(species):
+            parser.error(f"{args.binary_scores} does not hold the scores of the organisms in {organisms_json_file_path}")
+        pairwise = all_pairwise.subset(representative_species)
+        # the value of the leaves, see duplicates.leaf_value
+        top = int(np.max(pairwise.condensed)) if len(pairwise) else int(np.max(all_pairwise.condensed))
+    else:
+        with open(nw_json_file_path, 'r') as j:
+            nw_scores = json.loads(j.read())
+        representative_scores = representative_scores_of(nw_scores, groups)
+        top = leaf_value(representative_scores, nw_scores)
+        nw_scores = representative_scores
 
-    with open(thresholds_file_path, 'r') as f:
-        thresholds = [int(line) for line in f]
+    tree_of_life = Tree()
+    if args.engine in ('arrays', 'sparse', 'prim'):
+        if args.engine == 'sparse':
+            # pairs missing from the scores join clusters below every threshold
+            if floor is None:
+                floor = min([*nw_scores.values(), *thresholds]) - 1
+            edges = sparse_single_linkage_edges(len(representative_species), edges_from_scores(nw_scores, representative_species), floor)
+        else:
+            if not args.binary_scores:
+                pairwise = scores_from_dict(nw_scores, representative_species, floor)
+            edges = single_linkage_edges(pairwise)
+        spanning_edges = [(representative_species[i], representative_species[j], v) for i, j, v in edges]
+        edges = expand_edges(species, groups, edges, top)
+        if args.engine == 'arrays':
+            tree_of_life = ArrayTree.from_edges(species, edges)
+        else:
+            tree_of_life, root = tree_from_edges(tree_of_life, species, edges)
+    else:
+        nw_scores_sorted = {k: v for k, v in sorted(nw_scores.items(), key=lambda item: item[1], reverse=True)}
+        # duplicates merge first, at the value of the leaves
+        nw_scores_sorted = {**duplicate_scores(groups, top), **nw_scores_sorted}
+        union_find_structure = UnionFind(organisms.keys())
+        tracking_cache = init_tracking_cache(organisms, tree_of_life, nw_scores_sorted)
+
+        merges = []
+        tree_of_life, root, tracking_cache, union_find_structure = create_tree(tree_of_life, nw_scores_sorted, tracking_cache, union_find_structure, floor, merges)
+        # the joins of duplicates are not part of the spanning tree
+        spanning_edges = [(specie1, specie2, v) for specie1, specie2, v in merges if specie1 in groups and specie2 in groups]
+
+    with open(newick_txt_file, 'w') as f, open(newick_distance_txt_file, 'w') as f_distance:
+        if args.engine == 'arrays':
+            tree_of_life.write_newick(f, f_distance)
+        else:
+            tree_of_life.write_newick(root, f, f_distance)
 
+    if args.engine == 'arrays':
+        clusters_by_threshold = tree_of_life.clusters(thresholds)
+    else:
+        clusters_by_threshold = ClusterEngine(root).clusters(thresholds)
     clusters_dict = {}
     for threshold in thresholds:
-        clusters = generate_clusters(root, threshold, [])
-        clusters_dict[threshold] = clusters
+        clusters_dict[threshold] = [cluster.tolist() for cluster in clusters_by_threshold[threshold]]
 
     with open(clusters_output_path, 'w') as j:
-        json.dump(clusters_dict, j)
\ No newline at end of file
+        json.dump(clusters_dict, j)
+    write_spanning_edges(spanning_edges_output_path, spanning_edges)
\ No newline at end of file
@@ -0,0 +1,185 @@
+import json
+import argparse
+import itertools
+import numpy as np
+from scoring_model import ScoringModel, load_scoring_model
+from needleman_wunsch import score_pairs
+from score_matrix import scores_from_dict
+from duplicates import group_duplicates, self_score_pairs, expand_scores, representative_scores_of, leaf_value, expand_edges
+from phylogenetic_tree import Tree, ClusterEngine, tree_from_edges, edges_from_scores, single_linkage_edges, sparse_single_linkage_edges
+
+blosum_json_file_path = "../starter_code/blosum62.json"
+organisms_json_file_path = "../starter_code/organisms.json"
+thresholds_file_path = "../starter_code/thresholds.txt"
+full_scores_json_file_path = "./organisms_scores_blosum62.json"
+candidate_scores_output_path = "./candidate_scores_blosum62.json"
+
+# Prefilter for large inputs: instead of aligning all pairs, every organism
+# gets a MinHash sketch of its k-mers and only its top_k most similar
+# organisms by sketch are aligned with Needleman-Wunsch. The resulting partial
+# score set is a sparse graph, single linkage over it is built with
+# create_tree_sparse (phylogenetic_tree.py -e sparse). A pair missed by the
+# prefilter only changes the tree if it belongs to the maximum spanning tree
+# of the full scores, recall_report measures that against a full run.
+#
+# Sketch i of a sequence is the minimum of (a_i*x + b_i) mod MERSENNE_PRIME
+# over its k-mers x, two sketches agree in a position with probability equal
+# to the Jaccard similarity of the k-mer sets.
+
+KMER_SIZE = 3
+SKETCH_SIZE = 128
+TOP_K = 10
+MERSENNE_PRIME = 2**31 - 1
+# rows of the similarity matrix compared at once, memory is rows*n*SKETCH_SIZE bytes
+BLOCK_ROWS = 64
+
+
+def kmer_codes(codes, k:int, alphabet_size:int):
+    # distinct k-mers of an encoded sequence as integers in base alphabet_size
+    codes = codes.astype(np.int64)
+    if len(codes) < k:
+        return np.empty(0, dtype=np.int64)
+    kmers = np.zeros(len(codes) - k + 1, dtype=np.int64)
+    for offset in range(k):
+        kmers = (kmers*alphabet_size + codes[offset:len(codes) - k + 1 + offset]) % MERSENNE_PRIME
+    return np.unique(kmers)
+
+
+def minhash_sketches(encoded_sequences:list, alphabet_size:int, k=KMER_SIZE, sketch_size=SKETCH_SIZE, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=sketch_size, dtype=np.int64)
+    b = rng.integers(0, MERSENNE_PRIME, size=sketch_size, dtype=np.int64)
+    # sequences shorter than k have no k-mers, their sketch matches nothing
+    sketches = np.full((len(encoded_sequences), sketch_size), MERSENNE_PRIME, dtype=np.int64)
+    for row, codes in enumerate(encoded_sequences):
+        kmers = kmer_codes(codes, k, alphabet_size)
+        if len(kmers):
+            sketches[row] = ((a[:, None]*kmers[None, :] + b[:, None]) % MERSENNE_PRIME).min(axis=1)
+    return sketches
+
+
+def top_candidates(sketches, top_k=TOP_K, block_rows=BLOCK_ROWS):
+    # Pairs (i, j), i < j, where j is among the top_k most similar sketches of
+    # i or the other way round. Ties keep the lower index, like the stable sort
+    # of the scores everywhere else.
+    n = len(sketches)
+    top_k = min(top_k, n - 1)
+    pairs = set()
+    for start in range(0, n, block_rows):
+        block = sketches[start:start + block_rows]
+        similarity = (block[:, None, :] == sketches[None, :, :]).sum(axis=2)
+        similarity[np.arange(len(block)), np.arange(start, start + len(block))] = -1
+        nearest = np.argsort(-similarity, axis=1, kind="stable")[:, :top_k]
+        for offset, neighbours in enumerate(nearest.tolist()):
+            i = start + offset
+            pairs.update((min(i, j), max(i, j)) for j in neighbours)
+    return sorted(pairs)
+
+
+def candidate_pairs(organisms:dict, scoring_model:ScoringModel, top_k=TOP_K, k=KMER_SIZE, sketch_size=SKETCH_SIZE, seed=0):
+    all_animals = list(organisms.keys())
+    encoded_sequences = [scoring_model.encode(organisms[name]) for name in all_animals]
+    sketches = minhash_sketches(encoded_sequences, len(scoring_model.alphabet), k, sketch_size, seed)
+    return [(all_animals[i], all_animals[j]) for i, j in top_candidates(sketches, top_k)]
+
+
+def score_candidates(organisms:dict, scoring_model:ScoringModel, top_k=TOP_K, k=KMER_SIZE, sketch_size=SKETCH_SIZE, seed=0, workers=1, keep_duplicates=False):
+    # Partial score set in the format of organisms_scores_*.json. Like in
+    # needleman_wunsch.py only one representative per sequence is sketched and
+    # aligned, copies would otherwise fill each other's top_k.
+    representatives, groups = group_duplicates(organisms, keep_duplicates)
+    pairs = candidate_pairs(representatives, scoring_model, top_k, k, sketch_size, seed)
+    representative_scores = score_pairs(representatives, pairs, scoring_model, workers)
+    self_scores = score_pairs(representatives, self_score_pairs(groups), scoring_model)
+    return expand_scores(list(organisms.keys()), groups, representative_scores, self_scores)
+
+
+def _cluster_sets(root, thresholds:list):
+    clusters = ClusterEngine(root).clusters(thresholds)
+    return {threshold: {frozenset(cluster.tolist()) for cluster in clusters[threshold]} for threshold in thresholds}
+
+
+def _clustered_pairs(clusters:set):
+    return {frozenset(pair) for cluster in clusters for pair in itertools.combinations(cluster, 2)}
+
+
+def recall_report(organisms:dict, candidate_scores:dict, full_scores:dict, thresholds:list, keep_duplicates=False):
+    # Compares the sparse run with the full one, both built like
+    # phylogenetic_tree.py over one representative per sequence. Components of
+    # the sparse graph are joined below every threshold, so its clusters can
+    # only be split versions of the full ones and pair_recall (pairs in a
+    # common cluster in both runs / pairs in a common cluster in the full run)
+    # says how much of the clustering survived.
+    species = list(organisms.keys())
+    representatives, groups = group_duplicates(organisms, keep_duplicates)
+    representative_species = list(representatives)
+    full = representative_scores_of(full_scores, groups)
+    full_edges = single_linkage_edges(scores_from_dict(full, representative_species))
+    spanning = {(representative_species[i], representative_species[j]) for i, j, _ in full_edges}
+    candidates = {tuple(sorted(key.split("_"))) for key in candidate_scores}
+    found = sum(tuple(sorted(pair)) in candidates for pair in spanning)
+
+    sparse = representative_scores_of(candidate_scores, groups)
+    floor = min([*sparse.values(), *thresholds]) - 1
+    sparse_edges = sparse_single_linkage_edges(len(representative_species), edges_from_scores(sparse, representative_species), floor)
+    _, full_root = tree_from_edges(Tree(), species, expand_edges(species, groups, full_edges, leaf_value(full, full_scores)))
+    _, sparse_root = tree_from_edges(Tree(), species, expand_edges(species, groups, sparse_edges, leaf_value(sparse, candidate_scores)))
+    full_clusters = _cluster_sets(full_root, thresholds)
+    sparse_clusters = _cluster_sets(sparse_root, thresholds)
+
+    report = {
+        "species": len(species),
+        "pairs_aligned": len(candidate_scores),
+        "all_pairs": len(species)*(len(species)-1)//2,
+        "spanning_edges_found": found,
+        "spanning_edges": len(spanning),
+        "thresholds": {},
+    }
+    for threshold in thresholds:
+        expected_pairs = _clustered_pairs(full_clusters[threshold])
+        found_pairs = _clustered_pairs(sparse_clusters[threshold]) & expected_pairs
+        report["thresholds"][threshold] = {
+            "clusters_full": len(full_clusters[threshold]),
+            "clusters_sparse": len(sparse_clusters[threshold]),
+            "identical": full_clusters[threshold] == sparse_clusters[threshold],
+            "pair_recall": len(found_pairs)/len(expected_pairs) if expected_pairs else 1.0,
+        }
+    return report
+
+
+def print_report(report:dict):
+    print(f"Aligned {report['pairs_aligned']} of {report['all_pairs']} pairs ({report['pairs_aligned']/report['all_pairs']:.1%})")
+    print(f"Spanning tree edges found: {report['spanning_edges_found']} of {report['spanning_edges']}")
+    for threshold, row in report["thresholds"].items():
+        status = "identical" if row["identical"] else "different"
+        print(f"Threshold {threshold}: {row['clusters_sparse']} clusters, full run {row['clusters_full']}, {status}, pair recall {row['pair_recall']:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Aligns only the most similar pairs of organisms by MinHash sketch, for a sparse single linkage tree.')
+    parser.add_argument('-k', '--top-k', type=int, default=TOP_K, help='Candidates kept per organism.')
+    parser.add_argument('--kmer', type=int, default=KMER_SIZE, help='Length of the k-mers in the sketches.')
+    parser.add_argument('--sketch-size', type=int, default=SKETCH_SIZE, help='Number of hash functions of a sketch.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the hash functions.')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of worker processes for the alignments.')
+    parser.add_argument('-o', '--output', default=candidate_scores_output_path, help='JSON file for the scores of the candidate pairs.')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Sketch and align every copy of identical sequences.')
+    parser.add_argument('--report', action='store_true', help='Compare the sparse tree with the one of the full scores.')
+    parser.add_argument('--full-scores', default=full_scores_json_file_path, help='Scores of all pairs for --report.')
+    args = parser.parse_args()
+
+    scoring_model = load_scoring_model(blosum_json_file_path)
+    with open(organisms_json_file_path, 'r') as j:
+        organisms = json.loads(j.read())
+
+    candidate_scores = score_candidates(organisms, scoring_model, args.top_k, args.kmer, args.sketch_size, args.seed, args.workers, args.keep_duplicates)
+    with open(args.output, 'w') as j:
+        json.dump(candidate_scores, j)
+    print(f"{len(candidate_scores)} candidate scores written to {args.output}")
+
+    if args.report:
+        with open(args.full_scores, 'r') as j:
+            full_scores = json.loads(j.read())
+        with open(thresholds_file_path, 'r') as f:
+            thresholds = [int(line) for line in f]
+        print_report(recall_report(organisms, candidate_scores, full_scores, thresholds, args.keep_duplicates))
@@ -0,0 +1,84 @@
+import hashlib
+import sqlite3
+import time
+from scoring_model import ScoringModel
+
+
+def sequence_digest(seq: str):
+    return hashlib.sha1(seq.encode("ascii")).hexdigest()
+
+
+def matrix_digest(scoring_model:ScoringModel):
+    digest = hashlib.sha1(scoring_model.alphabet.encode("ascii"))
+    digest.update(scoring_model.substitution.tobytes())
+    digest.update(scoring_model.gap_costs.tobytes())
+    return digest.hexdigest()
+
+
+class ScoreCache:
+    # On-disk cache of Needleman-Wunsch scores keyed by the content of both
+    # sequences and of the scoring matrix, so renaming organisms or output files
+    # does not invalidate it. The score is symmetric, pairs are stored with the
+    # smaller digest first. SQLite takes care of locking between processes that
+    # write to the same file, and last_used drives LRU eviction once the cache
+    # grows past max_entries.
+
+    def __init__(self, path:str, max_entries=None, timeout=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "seq_a TEXT NOT NULL, seq_b TEXT NOT NULL, matrix TEXT NOT NULL, "
+                "score INTEGER NOT NULL, last_used INTEGER NOT NULL, "
+                "PRIMARY KEY (seq_a, seq_b, matrix))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+
+    @staticmethod
+    def make_key(digest1:str, digest2:str, matrix:str):
+        if digest2 < digest1:
+            digest1, digest2 = digest2, digest1
+        return (digest1, digest2, matrix)
+
+    def get_many(self, keys:list):
+        found = {}
+        now = time.time_ns()
+        with self.connection:
+            for key in set(keys):
+                row = self.connection.execute(
+                    "SELECT score FROM scores WHERE seq_a=? AND seq_b=? AND matrix=?", key
+                ).fetchone()
+                if row is not None:
+                    found[key] = row[0]
+            self.connection.executemany(
+                "UPDATE scores SET last_used=? WHERE seq_a=? AND seq_b=? AND matrix=?",
+                [(now,) + key for key in found]
+            )
+        return found
+
+    def put_many(self, scores:dict):
+        now = time.time_ns()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO scores (seq_a, seq_b, matrix, score, last_used) VALUES (?, ?, ?, ?, ?)",
+                [key + (int(score), now) for key, score in scores.items()]
+            )
+            self._evict()
+
+    def _evict(self):
+        if self.max_entries is None:
+            return
+        self.connection.execute(
+            "DELETE FROM scores WHERE rowid IN ("
+            "SELECT rowid FROM scores ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
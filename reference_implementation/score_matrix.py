@@ -0,0 +1,140 @@
+import argparse
+import json
+import numpy as np
+
+# Binary format for pairwise Needleman-Wunsch scores.
+#
+#   magic        8 bytes  b"NWSCORE1"
+#   header size  uint32   length of the JSON header in bytes, padded
+#   header       JSON     {"species": [...]} padded with spaces to a multiple of 8
+#   scores       int32    condensed upper triangle, pair (i, j) with i < j
+#                         at n*i - i*(i+1)/2 + j - i - 1, same order as
+#                         itertools.combinations(species, 2)
+#
+# The scores part is read with np.memmap, so loading does not depend on the
+# number of pairs and only the pages that are used are read from disk.
+
+MAGIC = b"NWSCORE1"
+SCORE_DTYPE = np.dtype("<i4")
+
+
+class PairwiseScores:
+
+    def __init__(self, species:list, condensed):
+        self.species = species
+        self.index = {name: i for i, name in enumerate(species)}
+        self.condensed = condensed
+
+    def __len__(self):
+        return len(self.condensed)
+
+    def condensed_index(self, i, j):
+        if i > j:
+            i, j = j, i
+        n = len(self.species)
+        return n*i - i*(i+1)//2 + j - i - 1
+
+    def get(self, name1:str, name2:str):
+        return int(self.condensed[self.condensed_index(self.index[name1], self.index[name2])])
+
+    def subset(self, species:list):
+        # Scores of some of the species, in the given order. Pairs keep their
+        # relative order when the species do. Without a change it is the same
+        # object, a memmap is not read at all.
+        if species == self.species:
+            return self
+        indices = np.array([self.index[name] for name in species], dtype=np.int64)
+        rows, columns = np.triu_indices(len(species), k=1)
+        low = np.minimum(indices[rows], indices[columns])
+        high = np.maximum(indices[rows], indices[columns])
+        n = len(self.species)
+        return PairwiseScores(species, np.asarray(self.condensed[n*low - low*(low+1)//2 + high - low - 1]))
+
+    def to_square(self, fill=0):
+        n = len(self.species)
+        square = np.full((n, n), fill, dtype=np.int64)
+        rows, columns = np.triu_indices(n, k=1)
+        square[rows, columns] = self.condensed
+        square[columns, rows] = self.condensed
+        return square
+
+    def to_dict(self):
+        n = len(self.species)
+        scores = {}
+        k = 0
+        for i in range(n):
+            for j in range(i+1, n):
+                scores[self.species[i]+"_"+self.species[j]] = int(self.condensed[k])
+                k += 1
+        return scores
+
+
+def scores_from_dict(scores:dict, species:list=None, fill=None):
+    # fill is the score of pairs missing from a partial score set, without it
+    # every pair is required
+    if species is None:
+        species = []
+        seen = set()
+        for key in scores:
+            for name in key.split("_"):
+                if name not in seen:
+                    seen.add(name)
+                    species.append(name)
+    pairwise = PairwiseScores(species, np.full(len(species)*(len(species)-1)//2, 0 if fill is None else fill, dtype=SCORE_DTYPE))
+    filled = np.zeros(len(pairwise), dtype=bool)
+    for key, value in scores.items():
+        name1, name2 = key.split("_")
+        k = pairwise.condensed_index(pairwise.index[name1], pairwise.index[name2])
+        pairwise.condensed[k] = value
+        filled[k] = True
+    if fill is None and not filled.all():
+        raise ValueError(f"Scores are missing for {int((~filled).sum())} pairs of species")
+    return pairwise
+
+
+def write_score_matrix(path:str, pairwise:PairwiseScores):
+    header = json.dumps({"species": pairwise.species}).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(header)).tobytes())
+        f.write(header)
+        f.write(np.ascontiguousarray(pairwise.condensed, dtype=SCORE_DTYPE).tobytes())
+
+
+def load_score_matrix(path:str, mode='r'):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a pairwise score file")
+        header_size = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+        header = json.loads(f.read(header_size).decode("utf-8"))
+    species = header["species"]
+    offset = len(MAGIC) + 4 + header_size
+    pairs = len(species)*(len(species)-1)//2
+    if pairs == 0:
+        return PairwiseScores(species, np.zeros(0, dtype=SCORE_DTYPE))
+    condensed = np.memmap(path, dtype=SCORE_DTYPE, mode=mode, offset=offset, shape=(pairs,))
+    return PairwiseScores(species, condensed)
+
+
+def json_to_binary(json_path:str, binary_path:str, species:list=None):
+    with open(json_path, 'r') as j:
+        scores = json.loads(j.read())
+    write_score_matrix(binary_path, scores_from_dict(scores, species))
+
+
+def binary_to_json(binary_path:str, json_path:str):
+    with open(json_path, 'w') as j:
+        json.dump(load_score_matrix(binary_path).to_dict(), j)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Converts pairwise Needleman-Wunsch scores between the JSON and the binary format.')
+    parser.add_argument('-i', '--input', help='Input file, .json or binary.', required=True)
+    parser.add_argument('-o', '--output', help='Output file, .json or binary.', required=True)
+    args = parser.parse_args()
+
+    if args.input.endswith(".json"):
+        json_to_binary(args.input, args.output)
+    else:
+        binary_to_json(args.input, args.output)
@@ -0,0 +1,40 @@
+import json
+import numpy as np
+
+
+class ScoringModel:
+    # Dense, integer-indexed form of a flat BLOSUM dict such as starter_code/blosum62.json.
+    # Single letter keys hold the gap cost of a residue, two letter keys hold the
+    # substitution score of a residue pair.
+
+    def __init__(self, alphabet, substitution, gap_costs):
+        self.alphabet = alphabet
+        self.index = {symbol: k for k, symbol in enumerate(alphabet)}
+        self.substitution = np.asarray(substitution, dtype=np.int16)
+        self.gap_costs = np.asarray(gap_costs, dtype=np.int16)
+        self._lookup = np.full(256, 255, dtype=np.uint8)
+        for symbol, k in self.index.items():
+            self._lookup[ord(symbol)] = k
+
+    @classmethod
+    def from_blosum_dict(cls, switch_cost:dict):
+        alphabet = "".join(k for k in switch_cost.keys() if len(k) == 1)
+        substitution = [[switch_cost[a+b] for b in alphabet] for a in alphabet]
+        gap_costs = [switch_cost[a] for a in alphabet]
+        return cls(alphabet, substitution, gap_costs)
+
+    def encode(self, seq: str):
+        codes = self._lookup[np.frombuffer(seq.encode("ascii"), dtype=np.uint8)]
+        if np.any(codes == 255):
+            unknown = sorted(set(seq) - set(self.alphabet))
+            raise KeyError(f"Symbols not present in the scoring matrix: {unknown}")
+        return codes
+
+    def encode_all(self, organisms:dict):
+        return {name: self.encode(seq) for name, seq in organisms.items()}
+
+
+def load_scoring_model(blosum_json_file_path:str):
+    with open(blosum_json_file_path, 'r') as j:
+        blosum = json.loads(j.read())
+    return ScoringModel.from_blosum_dict(blosum)
@@ -0,0 +1,61 @@
+NEWICK_CHUNK_SIZE = 4096
+
+# Helpers shared by the Node tree of phylogenetic_tree.py and the ArrayTree of
+# array_tree.py.
+
+
+def find(union_find:list, i):
+    # root of i in a union-find stored as a parent list, with path halving
+    while union_find[i] != i:
+        union_find[i] = union_find[union_find[i]]
+        i = union_find[i]
+    return i
+
+
+def write_newick(root, children, name, distance, out=None, out_with_distance=None, chunk_size=NEWICK_CHUNK_SIZE):
+    # Writes the plain and/or the with-distance Newick of a tree in a single
+    # traversal with an explicit stack, so deep trees do not hit the recursion
+    # limit. A node can be anything: children(node) returns (left, right) with
+    # None for a missing child, name(node) and distance(node) its labels. The
+    # right child is written first. Pieces are written to the file-like objects
+    # in chunks, no substring of the tree is ever copied into a bigger one.
+    with_distances = out_with_distance is not None
+    plain = []
+    with_distance = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, tuple):
+            # separator or closing bracket, already formatted for both variants
+            plain.append(node[0])
+            with_distance.append(node[1])
+        else:
+            left, right = children(node)
+            if left is None and right is None:
+                plain.append(name(node))
+                with_distance.append(f"{name(node)}:{distance(node)}" if with_distances else "")
+            else:
+                plain.append("(")
+                with_distance.append("(")
+                stack.append((f"){name(node)}", f"):{distance(node)}" if with_distances else ""))
+                if left is not None:
+                    stack.append(left)
+                stack.append((",", ","))
+                if right is not None:
+                    stack.append(right)
+
+        if len(plain) >= chunk_size:
+            _flush_newick(plain, out, with_distance, out_with_distance)
+
+    plain.append(";")
+    with_distance.append(";")
+    _flush_newick(plain, out, with_distance, out_with_distance)
+
+
+def _flush_newick(plain:list, out, with_distance:list, out_with_distance):
+    if out is not None:
+        out.write("".join(plain))
+    if out_with_distance is not None:
+        out_with_distance.write("".join(with_distance))
+    plain.clear()
+    with_distance.clear()
@@ -2,9 +2,9 @@ import numpy as np
 # import matplotlib.pyplot as plt
 import json
 
-def load_blosum(filename):
+def load_blosum_matrix(filename):
     """
-    Load in a BLOSUM scoring matrix for Needleman-Wunsch
+    Load in a BLOSUM scoring matrix in dense, integer-indexed form
 
     Parameters
     ----------
@@ -13,26 +13,49 @@ def load_blosum(filename):
     
     Returns
     -------
-    A dictionary of {string: int}
-        Key is string, value is score for that particular 
-        matching/substitution/deletion
+    alphabet: string
+        Residue symbols, the position of a symbol is its index
+    substitution: ndarray(N, N) of int16
+        Score for matching/substituting residue i with residue j
+    gap_costs: ndarray(N) of int16
+        Score for deleting residue i
     """
     fin = open(filename)
     lines = [l for l in fin.readlines() if l[0] != "#"]
     fin.close()
     symbols = lines[0].split()
     X = [[int(x) for x in l.split()] for l in lines[1::]]
-    X = np.array(X, dtype=int)
+    X = np.array(X, dtype=np.int16)
     N = X.shape[0]
+    alphabet = "".join(symbols[0:N-1])
+    substitution = X[0:N-1, 0:N-1].copy()
+    gap_costs = X[0:N-1, N-1].copy()
+    return alphabet, substitution, gap_costs
+
+def load_blosum(filename):
+    """
+    Load in a BLOSUM scoring matrix for Needleman-Wunsch
+
+    Parameters
+    ----------
+    filename: string
+        Path to BLOSUM file
+    
+    Returns
+    -------
+    A dictionary of {string: int}
+        Key is string, value is score for that particular 
+        matching/substitution/deletion
+    """
+    alphabet, substitution, gap_costs = load_blosum_matrix(filename)
+    N = len(alphabet)
     costs = {}
-    for i in range(N-1):
+    for i in range(N):
         for j in range(i, N):
-            c = X[i, j]
-            if j == N-1:
-                costs[symbols[i]] = c
-            else:
-                costs[symbols[i]+symbols[j]] = c
-                costs[symbols[j]+symbols[i]] = c
+            c = substitution[i, j]
+            costs[alphabet[i]+alphabet[j]] = c
+            costs[alphabet[j]+alphabet[i]] = c
+        costs[alphabet[i]] = gap_costs[i]
     return costs
 
 costs = load_blosum("./blosum50.bla")
@@ -0,0 +1,168 @@
+import argparse
+import csv
+import json
+import os
+from nw_score import read_file, index_scores, compare_score_index
+from cluster_compare import index_clusters, compare_cluster_index
+from newick_parser import load_newick
+from newick_compare import CladeIndex, build_leaf_index, extend_leaf_index, leaf_names_of, clade_difference, length_mismatches
+
+# Grades many solution folders against one reference folder. The expected
+# scores, clusters and trees are read and indexed once (sorted pair tuples,
+# frozensets, clade bitmasks), every solution folder is then only read and
+# compared against that index. The checks are the ones run by all_tests.py.
+
+def artifact_names(blosum:int):
+    return {
+        "scores": f"organisms_scores_blosum{blosum}.json",
+        "newick": f"tree_blosum{blosum}_newick.nw",
+        "newick_distance": f"tree_blosum{blosum}_newick_with_distance.nw",
+        "clusters": f"clusters_for_blosum{blosum}.json",
+        "png": f"phylogenetic_tree_blosum{blosum}.png",
+    }
+
+
+class ExpectedIndex:
+
+    def __init__(self, folder:str, blosum=62):
+        self.folder = folder
+        self.blosum = blosum
+        self.files = artifact_names(blosum)
+        self.scores = index_scores(read_file(os.path.join(folder, self.files["scores"])))
+        self.clusters = index_clusters(read_file(os.path.join(folder, self.files["clusters"])))
+        tree = load_newick(os.path.join(folder, self.files["newick"]))
+        tree_distance = load_newick(os.path.join(folder, self.files["newick_distance"]))
+        self.leaf_index = build_leaf_index(tree, tree_distance)
+        self.tree = CladeIndex(tree, self.leaf_index)
+        self.tree_distance = CladeIndex(tree_distance, self.leaf_index)
+
+
+def _result(passed:bool, detail):
+    return {"passed": passed, "detail": detail}
+
+
+def _index_actual_tree(index:ExpectedIndex, path:str):
+    tree = load_newick(path)
+    leaf_index = extend_leaf_index(index.leaf_index, tree)
+    return CladeIndex(tree, leaf_index), leaf_names_of(leaf_index)
+
+
+def _check_scores(index:ExpectedIndex, path:str):
+    differences = compare_score_index(index.scores, index_scores(read_file(path)))
+    return _result(not differences, f"{len(differences)} differences")
+
+
+def _check_valid(index:ExpectedIndex, path:str):
+    load_newick(path)
+    return _result(True, "valid")
+
+
+def _check_topology(index:ExpectedIndex, path:str):
+    actual, leaf_names = _index_actual_tree(index, path)
+    rf, max_rf, _, _ = clade_difference(index.tree, actual, leaf_names)
+    return _result(rf == 0, f"RF {rf} of {max_rf}")
+
+
+def _check_distances(index:ExpectedIndex, path:str):
+    actual, leaf_names = _index_actual_tree(index, path)
+    mismatches = length_mismatches(index.tree_distance, actual, leaf_names)
+    return _result(not mismatches, f"{len(mismatches)} mismatches")
+
+
+def _check_clusters(index:ExpectedIndex, path:str):
+    differences = compare_cluster_index(index.clusters, index_clusters(read_file(path)))
+    return _result(not differences, f"{len(differences)} thresholds differ")
+
+
+# check -> (artifact it reads, comparison), png_exists only looks for the file
+CHECK_FUNCTIONS = {
+    "nw_scores": ("scores", _check_scores),
+    "valid_newick_only_nodes": ("newick", _check_valid),
+    "valid_newick_with_distance": ("newick_distance", _check_valid),
+    "trees_only_nodes": ("newick", _check_topology),
+    "trees_with_distance": ("newick_distance", _check_distances),
+    "clusters": ("clusters", _check_clusters),
+    "png_exists": ("png", None),
+}
+
+
+def check_path(index:ExpectedIndex, folder:str, check:str):
+    return os.path.join(folder, index.files[CHECK_FUNCTIONS[check][0]])
+
+
+def run_check(index:ExpectedIndex, folder:str, check:str):
+    # A missing or unreadable file fails the check instead of raising.
+    artifact, compare = CHECK_FUNCTIONS[check]
+    path = check_path(index, folder, check)
+    if compare is None:
+        return _result(os.path.exists(path), index.files[artifact])
+    if not os.path.exists(path):
+        return _result(False, f"missing {index.files[artifact]}")
+    try:
+        return compare(index, path)
+    except Exception as e:
+        return _result(False, f"error: {e}")
+
+
+CHECKS = list(CHECK_FUNCTIONS)
+
+
+def compare_solution(index:ExpectedIndex, folder:str):
+    # Returns {check: {"passed": bool, "detail": ...}} for every check in CHECKS.
+    return {check: run_check(index, folder, check) for check in CHECKS}
+
+
+def report_row(folder:str, results:dict):
+    row = {"folder": folder, "passed": sum(r["passed"] for r in results.values()), "total": len(results)}
+    for check in CHECKS:
+        row[check] = "pass" if results[check]["passed"] else "fail"
+        row[check + "_detail"] = results[check]["detail"]
+    return row
+
+
+def write_report(rows, report_path:str, report_format=None):
+    # rows is consumed lazily, the CSV report is written as folders are graded
+    report_format = report_format or ("csv" if report_path.endswith(".csv") else "json")
+    if report_format == "csv":
+        fields = ["folder", "passed", "total"] + [name for check in CHECKS for name in (check, check + "_detail")]
+        with open(report_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+    else:
+        with open(report_path, 'w') as f:
+            json.dump(list(rows), f, indent=2)
+
+
+def grade(index:ExpectedIndex, folders:list):
+    for folder in folders:
+        row = report_row(folder, compare_solution(index, folder))
+        print(f"[{folder}] -> {row['passed']}/{row['total']} checks passed")
+        yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch comparator. Loads the expected scores, trees and clusters once and grades any number of solution folders against them.')
+    parser.add_argument('-e', '--expected', default='../reference_implementation', help='Folder with the expected results.')
+    parser.add_argument('-s', '--solutions', nargs='+', help='Solution folders to grade.', required=True)
+    parser.add_argument('-b', '--blosum', type=int, default=62, help='BLOSUM version of the compared files.')
+    parser.add_argument('-o', '--output', default='./batch_report.json', help='Report file, .json or .csv.')
+    parser.add_argument('-f', '--format', choices=['json', 'csv'], help='Report format, taken from the output extension by default.')
+    args = parser.parse_args()
+
+    index = ExpectedIndex(args.expected, args.blosum)
+    rows = []
+
+    def collect():
+        for row in grade(index, args.solutions):
+            rows.append(row)
+            yield row
+
+    write_report(collect(), args.output, args.format)
+    passed = sum(row["passed"] == row["total"] for row in rows)
+    print("--- Summary ---")
+    print(f'Passed: {passed}; Failed: {len(rows) - passed}; Total: {len(rows)}')
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,15 @@ def read_file(path: str) -> dict:
         return json.load(input_file)
 
 
+def index_clusters(clusters: dict):
+    return {threshold: {frozenset(cluster) for cluster in clusters[threshold]} for threshold in clusters}
+
+
 def compare_clusters(expected: dict, actual: dict):
+    return compare_cluster_index(index_clusters(expected), index_clusters(actual))
+
+
+def compare_cluster_index(expected: dict, actual: dict):
     differences = {}
 
     for threshold in expected:
@@ -18,8 +26,8 @@ def compare_clusters(expected: dict, actual: dict):
             continue
 
         # clusters comparison
-        expected_clusters = {frozenset(cluster) for cluster in expected[threshold]}
-        actual_clusters = {frozenset(cluster) for cluster in actual[threshold]}
+        expected_clusters = expected[threshold]
+        actual_clusters = actual[threshold]
 
         missing_clusters = expected_clusters - actual_clusters
         extra_clusters = actual_clusters - expected_clusters
@@ -63,7 +71,7 @@ def main():
     parser.add_argument('-a', '--actual', nargs='+', help='JSON file wit the actual cluster that will be tested against the base one. You can pass multiple files to compare all of them with the expected one', required=True)
     args = parser.parse_args()
 
-    expected = read_file(args.expected)
+    expected = index_clusters(read_file(args.expected))
 
     passed = 0
     failed = 0
@@ -73,7 +81,7 @@ def main():
         
         print('----------------------------------')
         print(f'Comparing expected {args.expected} with actual {actual_input}')
-        differences = compare_clusters(expected, actual)
+        differences = compare_cluster_index(expected, index_clusters(actual))
         if differences:
             pprint(differences, sort_dicts=False)
             failed += 1
@@ -0,0 +1,162 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+from batch_compare import ExpectedIndex, CHECKS, check_path, run_check, report_row, write_report
+
+# Runs the all_tests.py checks on every results_*/solution_*try_* folder under
+# LLM_experiments. Each (folder, check) pair is a task for a process pool,
+# every worker indexes the expected results once. Results are cached by the
+# content hash of the expected files and of the file the check reads, so
+# solutions that did not change since the last run are not compared again.
+
+llm_experiments_path = "../LLM_experiments"
+expected_folder_path = "../reference_implementation"
+cache_file_path = "./evaluation_cache.json"
+
+
+def discover_solutions(root:str):
+    pattern = os.path.join(root, "**", "results_*", "solution_*try_*")
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isdir(path))
+
+
+def solution_label(folder:str, root:str):
+    # <root>/<language>/results_<model>/solution_try_<n> -> (<language>, <model>, try_<n>)
+    # The language folder is what tells the tries of one model apart, solutions
+    # written straight into root keep it in their own name (solution_java_try_1).
+    results_folder = os.path.dirname(folder)
+    language = os.path.relpath(os.path.dirname(results_folder), root)
+    model = os.path.basename(results_folder)[len("results_"):]
+    attempt = os.path.basename(folder)[len("solution_"):]
+    return ("" if language == "." else language), model, attempt
+
+
+def file_digest(path:str):
+    if not os.path.exists(path):
+        return "missing"
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def expected_digest(index:ExpectedIndex):
+    digest = hashlib.sha1()
+    for file_name in sorted(index.files.values()):
+        digest.update(file_name.encode("utf-8"))
+        digest.update(file_digest(os.path.join(index.folder, file_name)).encode("ascii"))
+    return digest.hexdigest()
+
+
+def cache_key(expected:str, check:str, path:str):
+    return f"{expected}:{check}:{file_digest(path)}"
+
+
+def load_cache(path:str):
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path, 'r') as j:
+        return json.load(j)
+
+
+def save_cache(path:str, cache:dict):
+    if path is None:
+        return
+    with open(path, 'w') as j:
+        json.dump(cache, j)
+
+
+def _init_worker(expected_folder:str, blosum:int):
+    global _worker_index
+    _worker_index = ExpectedIndex(expected_folder, blosum)
+
+
+def _run_task(task:tuple):
+    folder, check = task
+    return task, run_check(_worker_index, folder, check)
+
+
+def _run_tasks(tasks:list, expected_folder:str, blosum:int, workers:int):
+    if workers <= 1 or len(tasks) <= 1:
+        _init_worker(expected_folder, blosum)
+        yield from map(_run_task, tasks)
+        return
+
+    with Pool(processes=workers, initializer=_init_worker, initargs=(expected_folder, blosum)) as pool:
+        yield from pool.imap_unordered(_run_task, tasks)
+
+
+def evaluate(folders:list, expected_folder:str, blosum=62, workers=1, cache:dict=None):
+    # Returns ({folder: {check: result}}, number of checks that were run),
+    # cache is updated in place.
+    cache = {} if cache is None else cache
+    index = ExpectedIndex(expected_folder, blosum)
+    expected = expected_digest(index)
+
+    results = {folder: {} for folder in folders}
+    keys = {}
+    for folder in folders:
+        for check in CHECKS:
+            key = cache_key(expected, check, check_path(index, folder, check))
+            if key in cache:
+                results[folder][check] = cache[key]
+            else:
+                keys[(folder, check)] = key
+
+    for (folder, check), result in _run_tasks(list(keys), expected_folder, blosum, workers):
+        results[folder][check] = result
+        cache[keys[(folder, check)]] = result
+
+    # checks come back in any order from the pool
+    return {folder: {check: results[folder][check] for check in CHECKS} for folder in folders}, len(keys)
+
+
+def format_matrix(results:dict, root:str):
+    header = ["language", "model", "try"] + CHECKS + ["passed"]
+    rows = []
+    for folder, checks in results.items():
+        language, model, attempt = solution_label(folder, root)
+        passed = sum(result["passed"] for result in checks.values())
+        rows.append([language, model, attempt] + ["pass" if checks[check]["passed"] else "FAIL" for check in CHECKS] + [f"{passed}/{len(CHECKS)}"])
+    rows.sort(key=lambda row: (row[1], row[0], row[2]))
+
+    widths = [max(len(str(row[k])) for row in [header] + rows) for k in range(len(header))]
+    lines = ["  ".join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip() for row in [header] + rows]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluates every results_*/solution_*try_* folder against the reference results and prints a pass/fail matrix.')
+    parser.add_argument('-r', '--root', default=llm_experiments_path, help='Folder searched for solutions.')
+    parser.add_argument('-e', '--expected', default=expected_folder_path, help='Folder with the expected results.')
+    parser.add_argument('-b', '--blosum', type=int, default=62, help='BLOSUM version of the compared files.')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='Number of worker processes, 1 runs the checks serially.')
+    parser.add_argument('--cache', default=cache_file_path, help='JSON file with cached check results.')
+    parser.add_argument('--no-cache', action='store_true', help='Run every check, ignore and do not write the cache.')
+    parser.add_argument('-o', '--output', help='Optional report file, .json or .csv.')
+    args = parser.parse_args()
+
+    cache_path = None if args.no_cache else args.cache
+    folders = discover_solutions(args.root)
+    if not folders:
+        print(f"No solution folders found under {args.root}")
+        return
+
+    cache = load_cache(cache_path)
+    results, computed = evaluate(folders, args.expected, args.blosum, args.workers, cache)
+    save_cache(cache_path, cache)
+
+    print(format_matrix(results, args.root))
+    if args.output:
+        write_report((report_row(folder, checks) for folder, checks in results.items()), args.output)
+
+    passed = sum(all(result["passed"] for result in checks.values()) for checks in results.values())
+    print("--- Summary ---")
+    print(f'Checks run: {computed}; Taken from cache: {len(folders)*len(CHECKS) - computed}')
+    print(f'Passed: {passed}; Failed: {len(folders) - passed}; Total: {len(folders)}')
+
+if __name__ == "__main__":
+    main()
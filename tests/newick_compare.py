@@ -1,38 +1,90 @@
-import argparse 
-from ete3 import Tree
-
-def compare_trees(expected_file_path:str, actual_file_path:str):
-    expected_tree = Tree(expected_file_path)
-    actual_tree = Tree(actual_file_path)
-    # return expected_tree.write(format=1) == actual_tree.write(format=1)
-    score = expected_tree.robinson_foulds(actual_tree)
-    rf = score[0]
-    max_rf = score[1]
-    parts_t1 = score[3]
-    parts_t2 = score[4]
-    print("RF distance is %s over a total of %s" %(rf, max_rf))
-    print("Partitions in tree2 that were not found in tree1:", parts_t1 - parts_t2)
-    print("Partitions in tree1 that were not found in tree2:", parts_t2 - parts_t1)
-    return rf == 0 #Two identical trees should produce 0 distance
-
-def compare_branch_lengths(expected_file_path:str, actual_file_path:str):
+import argparse
+from newick_parser import load_tree
+
+# Clades are compared as integer bitmasks over a leaf index shared by both
+# trees: bit i is set when the i-th leaf name is under the node. A mask is the
+# OR of the masks of its children, so all clades of a tree come out of a single
+# postorder traversal, and matching a clade between trees is a dict lookup
+# instead of rebuilding leaf name sets for every pair of nodes.
+
+def build_leaf_index(*trees):
+    names = set()
+    for tree in trees:
+        names.update(leaf.name for leaf in tree.iter_leaves())
+    return {name: i for i, name in enumerate(sorted(names))}
+
+def extend_leaf_index(leaf_index:dict, tree):
+    # new leaves get the next free bits, so masks built with leaf_index stay valid
+    extended = leaf_index
+    for leaf in tree.iter_leaves():
+        if leaf.name not in extended:
+            if extended is leaf_index:
+                extended = dict(leaf_index)
+            extended[leaf.name] = len(extended)
+    return extended
+
+def clade_masks(tree, leaf_index:dict):
+    masks = {}
+    for node in tree.traverse("postorder"):
+        if node.is_leaf():
+            mask = 1 << leaf_index[node.name]
+        else:
+            mask = 0
+            for child in node.children:
+                mask |= masks[child]
+        masks[node] = mask
+    return masks
+
+def mask_to_names(mask:int, leaf_names:list):
+    names = []
+    i = 0
+    while mask:
+        if mask & 1:
+            names.append(leaf_names[i])
+        mask >>= 1
+        i += 1
+    return tuple(names)
+
+class CladeIndex:
+    # Clades of one tree as bitmasks, kept apart from the tree so an expected
+    # tree can be indexed once and compared with any number of actual trees.
+
+    def __init__(self, tree, leaf_index:dict):
+        masks = clade_masks(tree, leaf_index)
+        self.root_mask = masks[tree]
+        self.clades = set(masks.values())
+        # (mask, dist) of internal nodes in postorder, and the distance of the
+        # first node in postorder for every clade
+        self.internal = [(mask, node.dist) for node, mask in masks.items() if not node.is_leaf()]
+        self.dists = {}
+        for node, mask in masks.items():
+            self.dists.setdefault(mask, node.dist)
+
+def leaf_names_of(leaf_index:dict):
+    return sorted(leaf_index, key=leaf_index.get)
+
+def clade_difference(expected:CladeIndex, actual:CladeIndex, leaf_names:list):
+    # Rooted Robinson-Foulds distance with the same conventions as ete3:
+    # clades are restricted to the leaves both trees share, and the maximum
+    # counts the non-trivial clades of both trees minus the two roots.
+    common = expected.root_mask & actual.root_mask
+    expected_clades = expected.clades if common == expected.root_mask else {mask & common for mask in expected.clades}
+    actual_clades = actual.clades if common == actual.root_mask else {mask & common for mask in actual.clades}
+    expected_clades = expected_clades - {0}
+    actual_clades = actual_clades - {0}
+    rf = len(expected_clades ^ actual_clades)
+    max_rf = sum(1 for mask in expected_clades if mask & (mask - 1)) + sum(1 for mask in actual_clades if mask & (mask - 1)) - 2
+    only_expected = {mask_to_names(mask, leaf_names) for mask in expected_clades - actual_clades}
+    only_actual = {mask_to_names(mask, leaf_names) for mask in actual_clades - expected_clades}
+    return rf, max_rf, only_expected, only_actual
+
+def length_mismatches(expected:CladeIndex, actual:CladeIndex, leaf_names:list):
     mismatches = []
-    expected_tree = Tree(expected_file_path)
-    actual_tree = Tree(actual_file_path)
-
-    for n1 in expected_tree.traverse("postorder"):
-        if n1.is_leaf():
-            continue
-
-        leaves = set(n1.get_leaf_names())
-        match = None
-
-        for n2 in actual_tree.traverse("postorder"):
-            if set(n2.get_leaf_names()) == leaves:
-                match = n2
-                break
+    for mask, dist1 in expected.internal:
+        dist2 = actual.dists.get(mask)
 
-        if match is None:
+        if dist2 is None:
+            leaves = set(mask_to_names(mask, leaf_names))
             mismatches.append({
                 "type": "missing_node",
                 "leaves": leaves,
@@ -40,22 +92,46 @@ def compare_branch_lengths(expected_file_path:str, actual_file_path:str):
             })
             continue
 
-        if abs(n1.dist - match.dist) > 1e-6:
+        if abs(dist1 - dist2) > 1e-6:
+            leaves = set(mask_to_names(mask, leaf_names))
             mismatches.append({
                 "type": "length_mismatch",
                 "leaves": leaves,
-                "dist1": n1.dist,
-                "dist2": match.dist,
-                "message": f"Branch length mismatch for node with leaves {leaves}: {n1.dist} vs {match.dist}"
+                "dist1": dist1,
+                "dist2": dist2,
+                "message": f"Branch length mismatch for node with leaves {leaves}: {dist1} vs {dist2}"
             })
 
     return mismatches
 
+def robinson_foulds(expected_tree, actual_tree):
+    leaf_index = build_leaf_index(expected_tree, actual_tree)
+    return clade_difference(CladeIndex(expected_tree, leaf_index), CladeIndex(actual_tree, leaf_index), leaf_names_of(leaf_index))
+
+def branch_length_mismatches(expected_tree, actual_tree):
+    leaf_index = build_leaf_index(expected_tree, actual_tree)
+    return length_mismatches(CladeIndex(expected_tree, leaf_index), CladeIndex(actual_tree, leaf_index), leaf_names_of(leaf_index))
+
+def compare_trees(expected_file_path:str, actual_file_path:str, backend="native"):
+    expected_tree = load_tree(expected_file_path, backend)
+    actual_tree = load_tree(actual_file_path, backend)
+    rf, max_rf, only_expected, only_actual = robinson_foulds(expected_tree, actual_tree)
+    print("RF distance is %s over a total of %s" %(rf, max_rf))
+    print("Partitions in tree2 that were not found in tree1:", only_expected)
+    print("Partitions in tree1 that were not found in tree2:", only_actual)
+    return rf == 0 #Two identical trees should produce 0 distance
+
+def compare_branch_lengths(expected_file_path:str, actual_file_path:str, backend="native"):
+    expected_tree = load_tree(expected_file_path, backend)
+    actual_tree = load_tree(actual_file_path, backend)
+    return branch_length_mismatches(expected_tree, actual_tree)
+
 def main():
     parser = argparse.ArgumentParser(description='Newick trees compoarator. Gets two files with the trees in newick format and compare them with each other.')
     parser.add_argument('-e', '--expected', help='NW file with the expected tree.', required=True)
     parser.add_argument('-a', '--actual', nargs='+', help='NW file wit the actual tree that will be tested against the base one. You can pass multiple files to compare all of them with the expected one', required=True)
     parser.add_argument('-d', '--distances', action=argparse.BooleanOptionalAction, help='Flag determining if files include branch distances')
+    parser.add_argument('-b', '--backend', choices=['native', 'ete3'], default='native', help='Newick parser to use, ete3 needs PyQt5 installed.')
     args = parser.parse_args()
 
     passed = 0
@@ -68,21 +144,21 @@ def main():
         print('----------------------------------')
         print(f'Comparing expected {expeted_input} with actual {actual_input} ONLY on branches')
 
-        if compare_trees(expeted_input, actual_input):
+        if compare_trees(expeted_input, actual_input, args.backend):
             print('Trees topologies are the same!')
             passed += 1
         else:
             print("Trees topologies are not the same!")
             failed += 1
         print('----------------------------------')
-    
+
     if args.distances:
         for actual_input in args.actual:
 
             print('----------------------------------')
             print(f'Comparing expected {expeted_input} with actual {actual_input} on distances')
 
-            if compare_branch_lengths(expeted_input, actual_input) == []:
+            if compare_branch_lengths(expeted_input, actual_input, args.backend) == []:
                 print('Trees distances are the same!')
                 passed += 1
             else:
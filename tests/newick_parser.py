@@ -0,0 +1,214 @@
+import io
+
+# Pure Python reader and writer for the Newick trees this project produces:
+# names only, e.g. (A,(B,C)1199)832; or names with distances, e.g.
+# (A:10,(B:3,C:3):7):0; Internal nodes may carry a numeric label (support) and
+# a distance, leaves must have a name. The file is tokenized in chunks and the
+# tree is built with an explicit stack, so deep trees do not hit the recursion
+# limit and validation does not need to import ete3.
+#
+# TreeNode follows the part of the ete3 TreeNode API the test scripts use
+# (name, dist, support, children, is_leaf, traverse, iter_leaves,
+# get_leaf_names), so either backend can be passed to the comparisons.
+
+DELIMITERS = "(),;"
+READ_CHUNK_SIZE = 65536
+DEFAULT_DIST = 1.0
+DEFAULT_SUPPORT = 1.0
+
+
+class NewickError(ValueError):
+    pass
+
+
+class TreeNode:
+
+    __slots__ = ("name", "dist", "support", "children", "up")
+
+    def __init__(self, name='', dist=DEFAULT_DIST, support=DEFAULT_SUPPORT):
+        self.name = name
+        self.dist = dist
+        self.support = support
+        self.children = []
+        self.up = None
+
+    def add_child(self, child):
+        child.up = self
+        self.children.append(child)
+        return child
+
+    def is_leaf(self):
+        return not self.children
+
+    def is_root(self):
+        return self.up is None
+
+    def traverse(self, strategy="preorder"):
+        if strategy == "preorder":
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                yield node
+                stack.extend(reversed(node.children))
+        elif strategy == "postorder":
+            stack = [(self, False)]
+            while stack:
+                node, visited = stack.pop()
+                if visited or not node.children:
+                    yield node
+                    continue
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.children))
+        else:
+            raise ValueError(f"Unknown traversal strategy: {strategy}")
+
+    def iter_leaves(self):
+        for node in self.traverse("preorder"):
+            if not node.children:
+                yield node
+
+    def get_leaf_names(self):
+        return [leaf.name for leaf in self.iter_leaves()]
+
+    def write(self, distance=False):
+        out = io.StringIO()
+        write_newick(self, out, distance)
+        return out.getvalue()
+
+
+def tokenize(stream, chunk_size=READ_CHUNK_SIZE):
+    # Yields "(", ")", ",", ";" and the labels between them, stripped of
+    # surrounding whitespace. Labels keep inner spaces ("Black garden ant").
+    label = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        start = 0
+        for position, char in enumerate(chunk):
+            if char in DELIMITERS:
+                label.append(chunk[start:position])
+                text = "".join(label).strip()
+                if text:
+                    yield text
+                label.clear()
+                yield char
+                start = position + 1
+        label.append(chunk[start:])
+    text = "".join(label).strip()
+    if text:
+        yield text
+
+
+def _parse_float(text:str, label:str):
+    try:
+        return float(text)
+    except ValueError:
+        raise NewickError(f"Unexpected newick format '{label}'")
+
+
+def _apply_label(node:TreeNode, label:str):
+    parts = label.split(":")
+    if len(parts) > 2:
+        raise NewickError(f"Unexpected newick format '{label}'")
+    name = parts[0].strip()
+    if len(parts) == 2:
+        node.dist = _parse_float(parts[1].strip(), label)
+    if node.children:
+        # internal labels are support values, as in ete3 format 0
+        if name:
+            node.support = _parse_float(name, label)
+    elif name:
+        node.name = name
+    else:
+        raise NewickError("Empty leaf node found")
+
+
+def read_newick(stream, chunk_size=READ_CHUNK_SIZE):
+    # Builds the tree from a file object. Raises NewickError when the text is
+    # not a single tree terminated by ';'.
+    holder = TreeNode()
+    stack = [holder]
+    # node that was just completed and may still get a label, None right
+    # after '(' or ','
+    current = None
+    finished = False
+
+    for token in tokenize(stream, chunk_size):
+        if finished:
+            raise NewickError("Unexpected text after the end of the tree")
+        if token == "(":
+            if current is not None:
+                raise NewickError("Unexpected '(' after a node")
+            stack.append(_new_node(stack))
+        elif token in ",)":
+            if len(stack) < 2:
+                raise NewickError("Parentheses do not match")
+            if current is None:
+                raise NewickError("Empty leaf node found")
+            current = stack.pop() if token == ")" else None
+        elif token == ";":
+            if len(stack) != 1 or current is None:
+                raise NewickError("Parentheses do not match")
+            finished = True
+        else:
+            if current is None:
+                current = _new_node(stack)
+            _apply_label(current, token)
+
+    if not finished:
+        raise NewickError("Malformed newick tree structure, missing ';'")
+    root = holder.children[0]
+    root.up = None
+    return root
+
+
+def _new_node(stack:list):
+    # the root has no branch above it, so its distance defaults to 0
+    return stack[-1].add_child(TreeNode(dist=DEFAULT_DIST if len(stack) > 1 else 0.0))
+
+
+def parse_newick(text:str):
+    return read_newick(io.StringIO(text))
+
+
+def load_newick(file_path:str):
+    with open(file_path, 'r') as f:
+        return read_newick(f)
+
+
+def format_distance(dist):
+    return str(int(dist)) if float(dist).is_integer() else repr(float(dist))
+
+
+def write_newick(root, out, distance=False):
+    # Iterative writer, children are written in their stored order. With
+    # distance=True every node gets ":dist", which reproduces the files written
+    # by the reference implementation.
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.write(item)
+            continue
+        suffix = f":{format_distance(item.dist)}" if distance else ""
+        if item.children:
+            out.write("(")
+            stack.append(")" + suffix)
+            for k, child in enumerate(reversed(item.children)):
+                if k:
+                    stack.append(",")
+                stack.append(child)
+        else:
+            out.write(item.name + suffix)
+    out.write(";")
+
+
+def load_tree(file_path:str, backend="native"):
+    # ete3 is only imported when it is asked for, it pulls in PyQt5
+    if backend == "native":
+        return load_newick(file_path)
+    if backend == "ete3":
+        from ete3 import Tree
+        return Tree(file_path, format=0)
+    raise ValueError(f"Unknown newick backend: {backend}")
@@ -1,9 +1,13 @@
 import argparse 
-from ete3 import Tree
+from newick_parser import load_tree
 
-def check_valid_newick(file_path):
+def check_valid_newick(file_path, backend="native"):
     try:
-        Tree(file_path, format=0).write(format=1)
+        # the native parser rejects malformed trees while reading, ete3 only
+        # while writing them back
+        tree = load_tree(file_path, backend)
+        if backend == "ete3":
+            tree.write(format=1)
         return True
     except:
         return False
@@ -12,6 +16,7 @@ def check_valid_newick(file_path):
 def main():
     parser = argparse.ArgumentParser(description='Validates if the files contains valid tree encoded in Newick format.')
     parser.add_argument('-t', '--tree', nargs='+', help='File with tree represented in Newick format, either with the distances or withouth them.', required=True)
+    parser.add_argument('-b', '--backend', choices=['native', 'ete3'], default='native', help='Newick parser to use, ete3 needs PyQt5 installed.')
     args = parser.parse_args()
 
     passed = 0
@@ -19,7 +24,7 @@ def main():
 
     for tree_file in args.tree:
 
-        if check_valid_newick(tree_file):
+        if check_valid_newick(tree_file, args.backend):
             print(f"[{tree_file}] -> valid")
             passed += 1
         else:
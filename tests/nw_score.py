@@ -6,26 +6,34 @@ def read_file(path: str) -> dict:
     with open(path) as input_file:
         return json.load(input_file)
 
-def compare_dicts(expected: dict, actual: dict):
+def pair_key(key: str):
+    # "A_B" and "B_A" describe the same pair, the sorted tuple is shared by both
+    name1, name2 = key.split("_", 1)
+    return (name1, name2) if name1 <= name2 else (name2, name1)
+
+def index_scores(scores: dict):
+    index = {}
+    for key, value in scores.items():
+        index.setdefault(pair_key(key), (key, value))
+    return index
+
+def compare_score_index(expected_index: dict, actual_index: dict):
     differences = {}
-    for k_expected in expected:
-        k_expected_list = k_expected.split("_")
-        k_expected_v2 = k_expected_list[1]+"_"+k_expected_list[0]
-        if k_expected in actual and actual[k_expected] != expected[k_expected]:
-            differences[k_expected] = {'expected': expected[k_expected], 'actual': actual[k_expected]} 
-        elif k_expected_v2 in actual and actual[k_expected_v2] != expected[k_expected]:
-            differences[k_expected] = {'expected': expected[k_expected], 'actual': actual[k_expected_v2]} 
-        elif k_expected not in actual and k_expected_v2 not in actual:
-            differences[k_expected] = {'expected': expected[k_expected], 'actual': 'missing'}
-    
-    for k_actual in actual:
-        k_actual_list = k_actual.split("_")
-        k_actual_v2 = k_actual_list[1]+"_"+k_actual_list[0]
-        if k_actual not in expected and k_actual_v2 not in expected:
-            differences[k_actual] = {'expected': 'missing', 'actual': actual[k_actual]}
+    for pair, (k_expected, v_expected) in expected_index.items():
+        if pair not in actual_index:
+            differences[k_expected] = {'expected': v_expected, 'actual': 'missing'}
+        elif actual_index[pair][1] != v_expected:
+            differences[k_expected] = {'expected': v_expected, 'actual': actual_index[pair][1]}
+
+    for pair, (k_actual, v_actual) in actual_index.items():
+        if pair not in expected_index:
+            differences[k_actual] = {'expected': 'missing', 'actual': v_actual}
 
     return differences
 
+def compare_dicts(expected: dict, actual: dict):
+    return compare_score_index(index_scores(expected), index_scores(actual))
+
 
 def main():
     parser = argparse.ArgumentParser(description='Needleman-Wunsch scores compoarator. Gets two JSON files with the ogranisms paris and their scores and compare them with each other.')
@@ -33,7 +41,7 @@ def main():
     parser.add_argument('-a', '--actual', nargs='+', help='JSON file wit the actual results that will be tested against the baseline. You can pass multiple files to compare all of them with the expected one', required=True)
     args = parser.parse_args()
 
-    expected = read_file(args.expected)
+    expected = index_scores(read_file(args.expected))
     
     passed = 0
     failed = 0
@@ -43,7 +51,7 @@ def main():
         
         print('----------------------------------')
         print(f'Comparing expected {args.expected} with actual {actual_input}')
-        differences = compare_dicts(expected, actual)
+        differences = compare_score_index(expected, index_scores(actual))
 
         if differences:
             print('The scores are not the same!')
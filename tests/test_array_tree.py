@@ -0,0 +1,42 @@
+import io
+import os
+import sys
+import random
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reference_implementation"))
+
+from phylogenetic_tree import Tree, ClusterEngine, single_linkage_edges, tree_from_edges
+from array_tree import ArrayTree
+from score_matrix import scores_from_dict
+
+# The array-backed tree has to write the same Newick and give the same
+# clusters, in the same order, as the Node tree built from the same edges.
+
+
+def random_edges(rng:random.Random):
+    species = [f"S{k}" for k in range(rng.randint(2, 30))]
+    high = rng.choice([3, 20, 1000])
+    scores = {name1+"_"+name2: rng.randint(0, high) for name1, name2 in itertools.combinations(species, 2)}
+    return species, single_linkage_edges(scores_from_dict(scores, species)), high
+
+
+def newick(write):
+    out, out_with_distance = io.StringIO(), io.StringIO()
+    write(out, out_with_distance)
+    return out.getvalue(), out_with_distance.getvalue()
+
+
+def test_array_tree_matches_node_tree():
+    rng = random.Random(0)
+    for trial in range(200):
+        species, edges, high = random_edges(rng)
+        _, root = tree_from_edges(Tree(), species, edges)
+        for array_tree in (ArrayTree.from_edges(species, edges), ArrayTree.from_node(root)):
+            assert newick(array_tree.write_newick) == newick(lambda out, out_with_distance: Tree().write_newick(root, out, out_with_distance)), trial
+
+            thresholds = list(range(-1, high + 2))
+            expected = ClusterEngine(root).clusters(thresholds)
+            clusters = array_tree.clusters(thresholds)
+            for threshold in thresholds:
+                assert [cluster.tolist() for cluster in clusters[threshold]] == [cluster.tolist() for cluster in expected[threshold]], (trial, threshold)
@@ -0,0 +1,52 @@
+import os
+import sys
+import random
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reference_implementation"))
+
+from phylogenetic_tree import Tree, ClusterEngine, CutIndex, single_linkage_edges, tree_from_edges, generate_clusters
+from score_matrix import scores_from_dict
+
+# Every CutIndex query is checked by brute force against the clusters of
+# generate_clusters. The scores are drawn from small ranges on most trees, so
+# many merges happen at the same height.
+
+
+def random_tree(rng:random.Random):
+    species = [f"S{k}" for k in range(rng.randint(2, 30))]
+    high = rng.choice([1, 3, 20, 1000])
+    scores = {name1+"_"+name2: rng.randint(0, high) for name1, name2 in itertools.combinations(species, 2)}
+    edges = single_linkage_edges(scores_from_dict(scores, species))
+    _, root = tree_from_edges(Tree(), species, edges)
+    # the clusters only change at the merge heights
+    heights = {edge[2] for edge in edges} | {edges[0][2]}
+    thresholds = sorted({-1} | heights | {height + 1 for height in heights})
+    return species, root, thresholds
+
+
+def test_cut_index_matches_generate_clusters():
+    rng = random.Random(0)
+    for trial in range(300):
+        species, root, thresholds = random_tree(rng)
+        index = CutIndex(root)
+        engine = ClusterEngine(root)
+
+        joined = {}
+        for threshold in thresholds:
+            clusters = generate_clusters(root, threshold, [], engine=engine)
+            assert index.cluster_count(threshold) == len(clusters), (trial, threshold)
+
+            cluster_of_name = {name: cluster for cluster in clusters for name in cluster}
+            for name in species:
+                cluster = index.cluster_of(name, threshold)
+                expected = cluster_of_name.get(name)
+                assert (None if cluster is None else cluster.tolist()) == expected, (trial, threshold, name)
+
+            # thresholds are increasing, the last one joining a pair is its join threshold
+            for cluster in clusters:
+                for name1, name2 in itertools.combinations(cluster, 2):
+                    joined[name1, name2] = joined[name2, name1] = threshold
+
+        for name1, name2 in itertools.permutations(species, 2):
+            assert index.join_threshold(name1, name2) == joined[name1, name2], (trial, name1, name2)
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LLM_experiments"))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from experiments_run import Model
+from experiments_run_async import run_all, DEFAULT_RATE_LIMITS
+
+# Drives run_all with the offline fake models: transcripts have to be written,
+# a failing conversation must not stop the others, and a rerun has to continue
+# from the checkpoint instead of asking the answered prompts again. A folder
+# without a checkpoint is never written to.
+
+PROMPTS = ["First prompt", "Second prompt", "Third prompt"]
+LANGUAGE = "python"
+
+
+class FailingChatModel(FakeListChatModel):
+    # answers until fail_at responses were given, then every call fails
+    fail_at: int = 1
+
+    def _call(self, *args, **kwargs):
+        if self.i >= self.fail_at:
+            raise RuntimeError("provider unavailable")
+        return super()._call(*args, **kwargs)
+
+
+def fake_model(name:str, responses:list):
+    return Model(short_name=name, model_name=name, provider="fake", responses=responses)
+
+
+def output_dir(root, name:str, try_number:str):
+    return os.path.join(root, LANGUAGE, f"results_{name}", f"solution_try_{try_number}")
+
+
+def read_records(root, name:str, try_number:str):
+    path = os.path.join(output_dir(root, name, try_number), f"conversation_{name}_{LANGUAGE}_try_{try_number}.jsonl")
+    with open(path, 'r', encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def read_transcript(root, name:str, try_number:str):
+    path = os.path.join(output_dir(root, name, try_number), f"conversation_{name}_{LANGUAGE}_try_{try_number}.md")
+    with open(path, 'r', encoding="utf-8") as f:
+        return f.read()
+
+
+def test_run_all_writes_transcripts_and_resumes(tmp_path):
+    working = fake_model("working", [f"working answer {i}" for i in range(1, 4)])
+    failing = fake_model("failing", ["first run answer 1"])
+    failing.model = FailingChatModel(responses=["first run answer 1", "never given"], fail_at=1)
+
+    results = asyncio.run(run_all([working, failing], PROMPTS, LANGUAGE, ["1"], DEFAULT_RATE_LIMITS, str(tmp_path), max_retries=0))
+    assert results[0] is True
+    assert isinstance(results[1], RuntimeError)
+
+    transcript = read_transcript(tmp_path, "working", "1")
+    for i, prompt in enumerate(PROMPTS, start=1):
+        assert f"## Prompt {i}" in transcript and prompt in transcript and f"working answer {i}" in transcript
+    assert "# The end" in transcript
+    assert [record["prompt"] for record in read_records(tmp_path, "working", "1")] == [1, 2, 3]
+
+    checkpoint_path = os.path.join(output_dir(tmp_path, "failing", "1"), f"checkpoint_failing_{LANGUAGE}_try_1.json")
+    with open(checkpoint_path, 'r', encoding="utf-8") as f:
+        assert [turn["prompt"] for turn in json.load(f)["turns"]] == [1]
+
+    # the rerun only gets the prompts without an answer
+    rerun = fake_model("failing", ["second run answer 2", "second run answer 3", "unexpected answer"])
+    results = asyncio.run(run_all([rerun], PROMPTS, LANGUAGE, ["1"], DEFAULT_RATE_LIMITS, str(tmp_path), max_retries=0))
+    assert results == [True]
+    assert rerun.model.i == 2
+
+    transcript = read_transcript(tmp_path, "failing", "1")
+    assert "first run answer 1" in transcript
+    assert "second run answer 2" in transcript and "second run answer 3" in transcript and "unexpected answer" not in transcript
+    assert transcript.index("first run answer 1") < transcript.index("second run answer 2") < transcript.index("second run answer 3")
+    assert [record["prompt"] for record in read_records(tmp_path, "failing", "1")] == [1, 2, 3]
+
+
+def test_existing_transcript_without_checkpoint_is_not_overwritten(tmp_path):
+    # a folder written by experiments_run.py has no checkpoint and must be left alone
+    folder = output_dir(tmp_path, "working", "1")
+    os.makedirs(folder)
+    transcript_path = os.path.join(folder, f"conversation_working_{LANGUAGE}_try_1.md")
+    with open(transcript_path, 'w', encoding="utf-8") as f:
+        f.write("real transcript")
+
+    model = fake_model("working", [f"working answer {i}" for i in range(1, 4)])
+    results = asyncio.run(run_all([model], PROMPTS, LANGUAGE, ["1"], DEFAULT_RATE_LIMITS, str(tmp_path), max_retries=0))
+    assert isinstance(results[0], FileExistsError)
+    assert model.model.i == 0
+    assert os.listdir(folder) == [os.path.basename(transcript_path)]
+    with open(transcript_path, 'r', encoding="utf-8") as f:
+        assert f.read() == "real transcript"
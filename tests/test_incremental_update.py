@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+import random
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reference_implementation"))
+
+from phylogenetic_tree import Tree, UnionFind, init_tracking_cache, create_tree, edges_from_scores, sparse_single_linkage_edges, single_linkage_edges, tree_from_edges
+from incremental_update import add_species, candidate_edges, build_tree
+from duplicates import group_duplicates, representative_scores_of, leaf_value, expand_edges
+from needleman_wunsch import score_pairs
+from scoring_model import load_scoring_model
+from score_matrix import scores_from_dict
+
+blosum_json_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "starter_code", "blosum62.json")
+
+# The incremental rebuild has to give the tree of a full rebuild with
+# create_tree, also when scores are tied and the new species are not at the
+# end of organisms.json.
+
+
+def random_scores(species:list, rng:random.Random, high:int):
+    return {name1+"_"+name2: rng.randint(0, high) for name1, name2 in itertools.combinations(species, 2)}
+
+
+def full_rebuild_newick(species:list, scores:dict):
+    scores_sorted = {k: v for k, v in sorted(scores.items(), key=lambda item: item[1], reverse=True)}
+    tree = Tree()
+    tracking_cache = init_tracking_cache(dict.fromkeys(species), tree, scores_sorted)
+    tree, root, _, _ = create_tree(tree, scores_sorted, tracking_cache, UnionFind(species))
+    return newick(tree, root)
+
+
+def newick(tree:Tree, root):
+    out, out_with_distance = io.StringIO(), io.StringIO()
+    tree.write_newick(root, out, out_with_distance)
+    return out_with_distance.getvalue()
+
+
+def incremental_newick(species:list, scores:dict, new_names:list):
+    old_species = [name for name in species if name not in new_names]
+    old_scores = {key: value for key, value in scores.items() if not set(key.split("_")) & set(new_names)}
+    old_spanning = [(old_species[i], old_species[j], v) for i, j, v in sparse_single_linkage_edges(len(old_species), edges_from_scores(old_scores, old_species))]
+    new_scores = {key: value for key, value in scores.items() if set(key.split("_")) & set(new_names)}
+    groups = {name: [name] for name in species}
+    tree, root, _ = build_tree(species, groups, candidate_edges(species, old_spanning, new_scores), max(scores.values()))
+    return newick(tree, root)
+
+
+def collapsed_tree(organisms:dict, scores:dict):
+    # the tree of phylogenetic_tree.py -e prim, returns (newick, spanning edges)
+    species = list(organisms)
+    representatives, groups = group_duplicates(organisms)
+    representative_species = list(representatives)
+    representative_scores = representative_scores_of(scores, groups)
+    edges = single_linkage_edges(scores_from_dict(representative_scores, representative_species))
+    tree, root = tree_from_edges(Tree(), species, expand_edges(species, groups, edges, leaf_value(representative_scores, scores)))
+    return newick(tree, root), [(representative_species[i], representative_species[j], v) for i, j, v in edges]
+
+
+def test_incremental_matches_full_rebuild_with_ties():
+    rng = random.Random(0)
+    for trial in range(300):
+        species = [f"S{k}" for k in range(rng.randint(3, 14))]
+        scores = random_scores(species, rng, high=rng.choice([1, 3, 10]))
+        new_names = rng.sample(species, rng.randint(1, len(species) - 2))
+        assert incremental_newick(species, scores, new_names) == full_rebuild_newick(species, scores), trial
+
+
+def test_incremental_matches_full_rebuild_appended():
+    rng = random.Random(1)
+    for trial in range(50):
+        species = [f"S{k}" for k in range(rng.randint(3, 14))]
+        scores = random_scores(species, rng, high=3)
+        new_names = species[-rng.randint(1, len(species) - 2):]
+        assert incremental_newick(species, scores, new_names) == full_rebuild_newick(species, scores), trial
+
+
+def test_incremental_matches_full_rebuild_with_duplicates():
+    # new organisms that are copies of existing ones, of each other, or that
+    # take over the representative of an existing sequence
+    scoring_model = load_scoring_model(blosum_json_file_path)
+    rng = random.Random(2)
+    sequences = ["".join(rng.choice("ACDEFGHIKLMNPQRSTVWY") for _ in range(rng.randint(8, 16))) for _ in range(5)]
+    organisms = {f"S{k}": rng.choice(sequences) for k in range(12)}
+    species = list(organisms)
+    scores = score_pairs(organisms, list(itertools.combinations(species, 2)), scoring_model)
+    full_newick, _ = collapsed_tree(organisms, scores)
+
+    for trial in range(20):
+        new_names = set(rng.sample(species, rng.randint(1, 5)))
+        old_organisms = {name: seq for name, seq in organisms.items() if name not in new_names}
+        old_scores = {key: value for key, value in scores.items() if not set(key.split("_")) & new_names}
+        _, old_spanning = collapsed_tree(old_organisms, old_scores)
+
+        all_scores, groups, edges, _ = add_species(old_scores, organisms, old_spanning, scoring_model)
+        assert all_scores == scores, trial
+        tree, root, _ = build_tree(species, groups, edges, leaf_value(representative_scores_of(all_scores, groups), all_scores))
+        assert newick(tree, root) == full_newick, trial
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reference_implementation"))
+
+from needleman_wunsch import BELOW_CUTOFF, needleman_wunsch, needleman_wunsch_banded, needleman_wunsch_cutoff, needleman_wunsch_one_to_many, TargetBlock
+from scoring_model import ScoringModel
+from alignment import hirschberg, script_score
+
+blosum_json_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "starter_code", "blosum62.json")
+
+# Every engine has to give the score of the original loop engine. The tied
+# scoring scheme has scores in {-1, 0, 1}, so many paths reach the optimum and
+# an engine that picks a wrong cell on a tie shows up.
+
+
+def tied_switch_cost(rng:random.Random, alphabet="ACGT"):
+    switch_cost = {a: rng.choice([-1, 0]) for a in alphabet}
+    switch_cost.update({a+b: rng.choice([-1, 0, 1]) for a in alphabet for b in alphabet})
+    return switch_cost
+
+
+def random_sequence(rng:random.Random, alphabet:str, max_length:int):
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length)))
+
+
+def cases():
+    rng = random.Random(0)
+    with open(blosum_json_file_path, 'r') as j:
+        blosum = json.loads(j.read())
+    blosum_alphabet = "".join(k for k in blosum if len(k) == 1)
+    for _ in range(60):
+        yield blosum, random_sequence(rng, blosum_alphabet, 40), random_sequence(rng, blosum_alphabet, 40)
+    for _ in range(60):
+        switch_cost = tied_switch_cost(rng)
+        yield switch_cost, random_sequence(rng, "ACGT", 30), random_sequence(rng, "AC", 30)
+
+
+def test_engines_match_loop():
+    for switch_cost, seq1, seq2 in cases():
+        expected = int(needleman_wunsch(seq1, seq2, switch_cost, engine="loop"))
+        model = ScoringModel.from_blosum_dict(switch_cost)
+        codes1, codes2 = model.encode(seq1), model.encode(seq2)
+        assert needleman_wunsch(seq1, seq2, switch_cost, engine="vector") == expected, (seq1, seq2)
+        assert needleman_wunsch(seq1, seq2, switch_cost, engine="linear") == expected, (seq1, seq2)
+        assert needleman_wunsch(seq1, seq2, switch_cost, engine="banded") == expected, (seq1, seq2)
+
+
+        ops = hirschberg(codes1, codes2, model)
+        assert len(ops) - ops.count("I") == len(seq1) and len(ops) - ops.count("D") == len(seq2)
+        assert script_score(ops, codes1, codes2, model) == expected, (seq1, seq2)
+
+        for cutoff in (expected - 5, expected, expected + 1, expected + 40):
+            score = needleman_wunsch_cutoff(codes1, codes2, model, cutoff)
+            assert score == (expected if expected >= cutoff else BELOW_CUTOFF), (seq1, seq2, cutoff)
+
+
+def test_banded_widens_to_exact_score():
+    # Narrow starting bands on asymmetric matrices with a wide score range, so
+    # most pairs need the band widened and a wrong bound gives a wrong score.
+    rng = random.Random(2)
+    for trial in range(1000):
+        switch_cost = {a: rng.choice([-3, -1, 0]) for a in "ACGT"}
+        switch_cost.update({a+b: rng.randint(-4, 4) for a in "ACGT" for b in "ACGT"})
+        model = ScoringModel.from_blosum_dict(switch_cost)
+        seq1 = random_sequence(rng, "ACGT", 60)
+        seq2 = random_sequence(rng, rng.choice(["AC", "GT", "ACGT"]), 60)
+        expected = needleman_wunsch(seq1, seq2, switch_cost, engine="linear")
+        for initial_band_width in (0, 1, 3):
+            score = needleman_wunsch_banded(model.encode(seq1), model.encode(seq2), model, initial_band_width)
+            assert score == expected, (trial, seq1, seq2, initial_band_width)
+
+
+def test_one_to_many_matches_loop():
+    rng = random.Random(1)
+    for trial in range(30):
+        switch_cost = tied_switch_cost(rng)
+        model = ScoringModel.from_blosum_dict(switch_cost)
+        query = random_sequence(rng, "ACGT", 25)
+        targets = [random_sequence(rng, "ACGT", 25) for _ in range(rng.randint(1, 8))]
+        block = TargetBlock([model.encode(target) for target in targets], model)
+        start = rng.randrange(len(targets))
+        scores = needleman_wunsch_one_to_many(model.encode(query), block, model, start)
+        assert scores.tolist() == [int(needleman_wunsch(query, target, switch_cost, engine="loop")) for target in targets[start:]], trial
@@ -0,0 +1,78 @@
+import os
+import sys
+import random
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from newick_parser import NewickError, parse_newick
+from newick_compare import robinson_foulds
+
+# The native parser and the bitmask Robinson-Foulds distance replaced ete3 in
+# the validation scripts, so both are checked against ete3 when it is installed.
+
+VALID = ["(A,B);", "((A,B),C);", "(A,(B,C)1199)832;", "(A:10,(B:3,C:3):7):0;", "(A,B):1;", "((A),B);",
+         "A;", " (A , B) ; ", "(Black garden ant,B);", "(A B,C);", "(A:1.5,(B:0.25,C:2e3)0.9:7);"]
+MALFORMED = ["", "()", "();", "(A,B)", "((A,B);", "(A,B));", "(A,,B);", "(,A);", "(A,B);C", "(A:1:2,B);", "(A:x,B);",
+             "(A:,B);", "(A,B)x;", "(A,(B,C)D);", "(A,B)C(D);", "((A,B)(C,D));", "(A,B),C;"]
+# ete3 accepts these, the native parser does not: a second tree after the
+# first ';' and a tree without any named leaf
+ETE3_ONLY = ["(A,B);(C,D);", ";", ":1;"]
+
+
+def parses(parse, text:str):
+    try:
+        parse(text)
+    except Exception:
+        return False
+    return True
+
+
+def signature(tree):
+    # names, distances, supports and shape in preorder, the same for both backends
+    return [(node.name, node.dist, None if node.is_leaf() else node.support, len(node.children)) for node in tree.traverse("preorder")]
+
+
+def random_newick(rng:random.Random, names:list):
+    # random rooted tree, inner nodes have two or three children and the root
+    # two, ete3 refuses to compare trees with a multifurcating root
+    nodes = list(names)
+    rng.shuffle(nodes)
+    while len(nodes) > 1:
+        k = 2 if len(nodes) <= 3 else rng.choice([2, 2, 3])
+        group = [nodes.pop(rng.randrange(len(nodes))) for _ in range(k)]
+        nodes.append("(" + ",".join(group) + ")")
+    return nodes[0] + ";"
+
+
+def test_parser_rejects_malformed_trees():
+    for text in VALID:
+        parse_newick(text)
+    for text in MALFORMED + ETE3_ONLY:
+        with pytest.raises(NewickError):
+            parse_newick(text)
+
+
+def test_parser_agrees_with_ete3():
+    ete3 = pytest.importorskip("ete3")
+    for text in VALID:
+        assert signature(parse_newick(text)) == signature(ete3.Tree(text, format=0)), text
+    for text in MALFORMED:
+        assert not parses(lambda t: ete3.Tree(t, format=0), text), text
+    for text in ETE3_ONLY:
+        assert parses(lambda t: ete3.Tree(t, format=0), text), text
+
+
+def test_robinson_foulds_matches_ete3():
+    ete3 = pytest.importorskip("ete3")
+    rng = random.Random(0)
+    for trial in range(200):
+        names = [f"S{k}" for k in range(rng.randint(2, 25))]
+        # some pairs only share part of their leaves
+        other_names = names if rng.random() < 0.7 else rng.sample(names, rng.randint(2, len(names))) + ["X1", "X2"][:rng.randint(0, 2)]
+        expected, actual = random_newick(rng, names), random_newick(rng, other_names)
+
+        rf, max_rf, only_expected, only_actual = robinson_foulds(parse_newick(expected), parse_newick(actual))
+        score = ete3.Tree(expected).robinson_foulds(ete3.Tree(actual))
+        assert (rf, max_rf) == (score[0], score[1]), (expected, actual)
+        assert only_expected == score[3] - score[4] and only_actual == score[4] - score[3], (expected, actual)